@@ -0,0 +1,141 @@
+"""
+Carrito del punto de venta.
+
+`Cart` guarda las líneas de la venta en curso (una por producto) y lleva los
+totales al día de forma incremental: cada alta, ajuste o baja suma o resta solo
+la diferencia de esa línea, así que el costo de escanear un producto no depende
+de cuántas líneas tenga el ticket. Los totales en Bs se recalculan en una sola
+pasada únicamente cuando cambia la tasa.
+
+La vista se entera de los cambios con un listener `on_change(event, product_id, line)`:
+
+- "line":   la línea `product_id` se agregó o cambió de cantidad.
+- "remove": la línea `product_id` se eliminó (`line` es None).
+- "reset":  cambiaron todas las líneas a la vez (tasa nueva o carrito vaciado);
+            `product_id` y `line` son None y hay que repintar todo.
+
+Cada línea es un dict {'nombre', 'precio_usd', 'precio_bs', 'stock_real', 'cantidad'},
+el mismo formato que espera `DatabaseManager.process_sale_transaction`.
+"""
+
+
+class Cart:
+    """Líneas de la venta en curso con totales incrementales (ver la descripción del módulo)."""
+    def __init__(self, rate, on_change=None):
+        self.rate = rate
+        self.on_change = on_change
+        self._lines = {}  # product_id -> línea; en el orden en que se agregaron
+        self.total_usd = 0.0
+        self.total_bs = 0.0
+        self.item_count = 0.0  # unidades (las cantidades pueden ser fraccionarias)
+
+    def __len__(self):
+        return len(self._lines)
+
+    def __bool__(self):
+        return bool(self._lines)
+
+    def __contains__(self, product_id):
+        return product_id in self._lines
+
+    def __iter__(self):
+        return iter(self._lines)
+
+    @property
+    def line_count(self):
+        return len(self._lines)
+
+    def items(self):
+        return self._lines.items()
+
+    def values(self):
+        return self._lines.values()
+
+    def get(self, product_id):
+        return self._lines.get(product_id)
+
+    def quantity(self, product_id):
+        line = self._lines.get(product_id)
+        return line['cantidad'] if line else 0
+
+    # --- Cambios ---
+
+    def add(self, product_id, nombre, precio_usd, stock_real, cantidad=1):
+        """Suma `cantidad` a la línea del producto, creándola si no existe."""
+        line = self._lines.get(product_id)
+        if line is None:
+            line = self._lines[product_id] = {
+                'nombre': nombre,
+                'precio_usd': precio_usd,
+                'precio_bs': precio_usd * self.rate,
+                'stock_real': stock_real,
+                'cantidad': 0,
+            }
+        else:
+            line['stock_real'] = stock_real
+        self._apply(product_id, line, line['cantidad'] + cantidad)
+
+    def set_quantity(self, product_id, cantidad):
+        """Fija la cantidad de una línea existente; con 0 o menos la elimina."""
+        line = self._lines.get(product_id)
+        if line is None:
+            return
+        if cantidad <= 0:
+            self.remove(product_id)
+            return
+        self._apply(product_id, line, cantidad)
+
+    def adjust(self, product_id, delta):
+        self.set_quantity(product_id, self.quantity(product_id) + delta)
+
+    def set_stock(self, product_id, stock_real):
+        line = self._lines.get(product_id)
+        if line is not None:
+            line['stock_real'] = stock_real
+
+    def remove(self, product_id):
+        line = self._lines.pop(product_id, None)
+        if line is None:
+            return
+        self._add_to_totals(line, -line['cantidad'])
+        if not self._lines:
+            self._zero_totals()  # sin líneas no debe quedar arrastre de redondeo
+        self._notify("remove", product_id, None)
+
+    def clear(self):
+        self._lines.clear()
+        self._zero_totals()
+        self._notify("reset", None, None)
+
+    def set_rate(self, rate):
+        """Cambia la tasa y recalcula precios y totales en Bs en una sola pasada."""
+        self.rate = rate
+        total_usd = 0.0
+        for line in self._lines.values():
+            line['precio_bs'] = line['precio_usd'] * rate
+            total_usd += line['cantidad'] * line['precio_usd']
+        # De paso se descarta el error de redondeo acumulado por los cambios incrementales
+        self.total_usd = total_usd
+        self.total_bs = total_usd * rate
+        self._notify("reset", None, None)
+
+    # --- Internos ---
+
+    def _apply(self, product_id, line, cantidad):
+        self._add_to_totals(line, cantidad - line['cantidad'])
+        line['cantidad'] = cantidad
+        self._notify("line", product_id, line)
+
+    def _add_to_totals(self, line, delta):
+        self.item_count += delta
+        self.total_usd += delta * line['precio_usd']
+        self.total_bs += delta * line['precio_bs']
+
+    def _zero_totals(self):
+        self.total_usd = 0.0
+        self.total_bs = 0.0
+        self.item_count = 0.0
+
+    def _notify(self, event, product_id, line):
+        if self.on_change:
+            self.on_change(event, product_id, line)
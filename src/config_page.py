@@ -3,6 +3,7 @@ from tkinter import messagebox, ttk, filedialog
 from datetime import datetime
 from .utils import is_valid_float
 from .sales_report_page import SalesReportPage
+from .db_manager import DatabaseManager, REMOTE_BACKUP_MESSAGE
 import hashlib 
 
 
@@ -235,10 +236,7 @@ class EditUserWindow(ctk.CTkToplevel):
 
 
     def _load_user_data(self):
-        row = self.db.fetch_one("SELECT * FROM usuarios WHERE id = ?", (self.user_id_to_edit,))
-        if row:
-            return dict(row)
-        return None
+        return self.db.fetch_one("SELECT * FROM usuarios WHERE id = ?", (self.user_id_to_edit,), row_type="dict")
 
 
     def _create_widgets(self):
@@ -322,12 +320,11 @@ class EditUserWindow(ctk.CTkToplevel):
 class ConfigPage(ctk.CTkFrame):
     """Panel de Administración centralizado para tareas sensibles (Tasa, Usuarios, Seguridad, Ventas)."""
     
-    def __init__(self, master, db_manager, user_id, update_rate_callback, user_role):
+    def __init__(self, master, db_manager, user_id, user_role):
         super().__init__(master, fg_color=BACKGROUND_DARK)
         self.db = db_manager
         self.user_id = user_id
         self.user_role = user_role # Rol del usuario actual
-        self.update_rate_callback = update_rate_callback
         
         self.grid_rowconfigure(1, weight=1)
         self.grid_columnconfigure(0, weight=1)
@@ -354,6 +351,7 @@ class ConfigPage(ctk.CTkFrame):
         self._configure_ttk_style()
         self._create_widgets()
         self.load_current_rate()
+        self.db.subscribe_config("exchange_rate", self._show_current_rate)
     
     def _configure_ttk_style(self):
         """Configuración de estilo para el Treeview (ttk)."""
@@ -617,7 +615,10 @@ class ConfigPage(ctk.CTkFrame):
         ctk.CTkLabel(backup_card, text="Guarda una copia de seguridad de la base de datos (profitus.db) en una ruta externa.", 
                      text_color="gray70").grid(row=1, column=0, sticky="w", padx=20, pady=(0, 10))
         
-        ctk.CTkButton(backup_card, text="⬇️ Generar Backup", command=self.create_backup, 
+        # Conectado a un servidor de tienda, las rutas de los diálogos serían de esta caja y no del servidor
+        file_state = "disabled" if self.db.remote else "normal"
+
+        ctk.CTkButton(backup_card, text="⬇️ Generar Backup", command=self.create_backup, state=file_state,
                       fg_color=ACCENT_GREEN, hover_color="#008a38",
                       font=ctk.CTkFont(size=14, weight="bold")).grid(row=2, column=0, padx=20, pady=(5, 20), sticky="w")
                               
@@ -633,10 +634,14 @@ class ConfigPage(ctk.CTkFrame):
         ctk.CTkLabel(restore_card, text="🚨 ¡PELIGRO! Reemplaza la DB actual (profitus.db) con un archivo de backup. REQUIERE REINICIO.", 
                      text_color=ACCENT_RED).grid(row=1, column=0, sticky="w", padx=20, pady=(0, 10))
         
-        ctk.CTkButton(restore_card, text="⬆️ Restaurar desde Backup", command=self.restore_database, 
+        ctk.CTkButton(restore_card, text="⬆️ Restaurar desde Backup", command=self.restore_database, state=file_state,
                       fg_color=ACCENT_RED, hover_color="#8b0000",
                       font=ctk.CTkFont(size=14, weight="bold")).grid(row=2, column=0, padx=20, pady=(5, 20), sticky="w")
 
+        if self.db.remote:
+            ctk.CTkLabel(tab_frame, text=f"ℹ️ {REMOTE_BACKUP_MESSAGE}",
+                         text_color="gray70", wraplength=700, justify="left").grid(row=3, column=0, sticky="nw", padx=20, pady=(0, 20))
+
 
 
     # =======================================================================
@@ -646,15 +651,17 @@ class ConfigPage(ctk.CTkFrame):
     def load_current_rate(self):
         """Carga la tasa de cambio actual desde la DB y actualiza el label local."""
         try:
-            rate = self.db.get_exchange_rate()
-            if rate is not None:
-                self.current_rate_label.configure(text=f"Bs. {rate:,.2f}", text_color=ACCENT_GREEN)
-            else:
-                self.current_rate_label.configure(text="No definida", text_color=ACCENT_RED)
+            self._show_current_rate(self.db.get_exchange_rate())
         except Exception as e:
             messagebox.showerror("Error de Carga", f"No se pudo cargar la tasa de cambio: {e}")
             self.current_rate_label.configure(text="Error", text_color=ACCENT_RED)
 
+    def _show_current_rate(self, rate):
+        if rate:
+            self.current_rate_label.configure(text=f"Bs. {rate:,.2f}", text_color=ACCENT_GREEN)
+        else:
+            self.current_rate_label.configure(text="No definida", text_color=ACCENT_RED)
+
 
 
     def save_exchange_rate(self):
@@ -686,11 +693,10 @@ class ConfigPage(ctk.CTkFrame):
 
 
 
-            self.db.set_exchange_rate(new_rate_float)
-            
-            self.current_rate_label.configure(text=f"Bs. {new_rate_float:,.2f}", text_color=ACCENT_GREEN)
-            
-            self.update_rate_callback() 
+            # Los labels de esta página, del Dashboard y el POS se actualizan por suscripción
+            if not self.db.set_exchange_rate(new_rate_float):
+                messagebox.showerror("Error al Guardar", "No se pudo guardar la tasa de cambio en la base de datos.")
+                return
             
             self.new_rate_entry.delete(0, 'end')
             messagebox.showinfo("Éxito", f"Tasa de cambio actualizada a Bs. {new_rate_float:,.2f}.")
@@ -713,6 +719,9 @@ class ConfigPage(ctk.CTkFrame):
         if self.user_role != "Administrador Total":
             messagebox.showwarning("Permiso Denegado", "Solo el Administrador Total puede crear copias de seguridad.")
             return
+        if self.db.remote:
+            messagebox.showinfo("Servidor de Tienda", REMOTE_BACKUP_MESSAGE)
+            return
         
         try:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -729,25 +738,35 @@ class ConfigPage(ctk.CTkFrame):
                 messagebox.showinfo("Cancelado", "El proceso de copia de seguridad fue cancelado.")
                 return
                 
-            success, message = self.db.perform_backup(destination_path)
-            
-            if success:
-                messagebox.showinfo("Backup Creado", 
-                                    f"Copia de seguridad de la base de datos creada exitosamente.\n\n"
-                                    f"Ruta: {destination_path}")
-            else:
-                messagebox.showerror("Error de Backup", f"No se pudo crear la copia de seguridad:\n{message}")
+            # El backup corre en el hilo de consultas para no congelar la interfaz
+            self.db.submit(DatabaseManager.perform_backup, destination_path,
+                           callback=lambda result: self._on_backup_finished(result, destination_path), readonly=True,
+                           error_callback=lambda e: messagebox.showerror("Error Inesperado", f"Ocurrió un error inesperado durante el backup: {e}"))
                 
         except Exception as e:
             messagebox.showerror("Error Inesperado", f"Ocurrió un error inesperado durante el backup: {e}")
 
 
 
+    def _on_backup_finished(self, result, destination_path):
+        success, message = result
+        if success:
+            messagebox.showinfo("Backup Creado", 
+                                f"Copia de seguridad de la base de datos creada exitosamente.\n\n"
+                                f"Ruta: {destination_path}")
+        else:
+            messagebox.showerror("Error de Backup", f"No se pudo crear la copia de seguridad:\n{message}")
+
+
+
     def restore_database(self):
         """Inicia el proceso de restauración de la base de datos desde un archivo de backup."""
         if self.user_role != "Administrador Total":
             messagebox.showwarning("Permiso Denegado", "Solo el Administrador Total puede restaurar la base de datos.")
             return
+        if self.db.remote:
+            messagebox.showinfo("Servidor de Tienda", REMOTE_BACKUP_MESSAGE)
+            return
 
 
 
@@ -810,8 +829,8 @@ class ConfigPage(ctk.CTkFrame):
     def load_users_data(self):
         """Carga todos los usuarios reales desde la DB y refresca el árbol."""
         try:
-            users = self.db.get_all_users()
-            self.users_data = {str(row["id"]): dict(row) for row in users}
+            users = self.db.get_all_users(row_type="dict")
+            self.users_data = {str(row["id"]): row for row in users}
             self._refresh_user_tree(self.users_data)
             self.delete_user_button.configure(state="disabled")
             self.save_role_button.configure(state="disabled")
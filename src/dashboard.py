@@ -1,12 +1,9 @@
 import customtkinter as ctk
 from tkinter import messagebox, ttk
-from PIL import Image
+from . import startup_timing
 
-# --- Importaciones de las Vistas ---
-from .pos_page import PosPage 
-from .inventory_page import InventoryPage
-from .config_page import ConfigPage # Usaremos este nombre por ahora, pero será nuestro AdminPanel
-# -----------------------------------
+# Las vistas (PosPage, InventoryPage, ConfigPage) se importan dentro de
+# _build_page, la primera vez que se abren, para no cargarlas al iniciar sesión.
 
 # Definición de colores 
 ACCENT_CYAN = "#00FFFF"
@@ -38,13 +35,13 @@ class DashboardFrame(ctk.CTkFrame):
         
         # Logo y Título
         try:
-            logo_img = ctk.CTkImage(light_image=Image.open(LOGO_PATH),
-                                    dark_image=Image.open(LOGO_PATH),
-                                    size=(40, 40)) 
+            from PIL import Image
+            logo = Image.open(LOGO_PATH)
+            logo_img = ctk.CTkImage(light_image=logo, dark_image=logo, size=(40, 40)) 
             ctk.CTkLabel(self.navigation_frame, image=logo_img, text=" PROFITUS", 
                          font=ctk.CTkFont(size=20, weight="bold"), 
                          text_color=ACCENT_CYAN, compound="left").grid(row=0, column=0, padx=20, pady=(20, 10))
-        except FileNotFoundError:
+        except (FileNotFoundError, ImportError):
             ctk.CTkLabel(self.navigation_frame, text="PROFITUS", 
                          font=ctk.CTkFont(size=20, weight="bold"), 
                          text_color=ACCENT_CYAN).grid(row=0, column=0, padx=20, pady=(20, 10))
@@ -114,11 +111,12 @@ class DashboardFrame(ctk.CTkFrame):
         self.content_container.grid_columnconfigure(0, weight=1)
         self.content_container.grid_rowconfigure(0, weight=1)
 
-        # Cargar y mostrar la tasa de cambio inicial
+        # Cargar y mostrar la tasa de cambio inicial; luego se actualiza sola al cambiar
         self.update_exchange_rate_label()
+        self.db.subscribe_config("exchange_rate", self._show_exchange_rate)
 
-        # 3. INICIALIZACIÓN DE PÁGINAS
-        self._create_pages()
+        # 3. INICIALIZACIÓN DE PÁGINAS: solo Home; el resto se construye al abrirse
+        self._create_home_page()
         
         self.select_frame_by_name("home")
 
@@ -146,21 +144,21 @@ class DashboardFrame(ctk.CTkFrame):
                 slaves[0].grid(row=8, column=0, sticky="ew", padx=10, pady=(10, 20))
 
     def update_exchange_rate_label(self):
-        """Carga la tasa de cambio actual desde la base de datos y actualiza el label."""
+        """Carga la tasa de cambio actual (caché de configuración) y actualiza el label."""
         try:
             rate = self.db.get_exchange_rate() 
-            formatted_rate = f"Bs. {rate:,.2f}" 
-            self.exchange_rate_label.configure(text=formatted_rate)
+            self._show_exchange_rate(rate)
             return rate 
         except Exception as e:
             print(f"Error al cargar la tasa de cambio: {e}")
             self.exchange_rate_label.configure(text="Error de carga")
             return None
 
-    def _create_pages(self):
-        """Instancia todas las páginas y las guarda en el diccionario self.pages."""
+    def _show_exchange_rate(self, rate):
+        self.exchange_rate_label.configure(text=f"Bs. {rate:,.2f}")
 
-        # 1. Página de Inicio (Home)
+    def _create_home_page(self):
+        """Crea la página de inicio (Home) y la guarda en self.pages."""
         home_frame = ctk.CTkFrame(self.content_container, fg_color=BACKGROUND_DARK)
         home_frame.grid_columnconfigure(0, weight=1)
         home_frame.grid_rowconfigure(0, weight=1)
@@ -180,18 +178,34 @@ class DashboardFrame(ctk.CTkFrame):
         
         self.pages["home"] = home_frame
 
-        # 2. Páginas funcionales
-        self.pages["inventory"] = InventoryPage(self.content_container, self.db, self.current_user_id, self.current_user_role)
-        self.pages["pos"] = PosPage(self.content_container, self.db, self.current_user_id)
-        
-        # IMPORTANTE: Pasamos el método de actualización y el rol del usuario a ConfigPage
-        self.pages["config"] = ConfigPage(
-            self.content_container, 
-            self.db, 
-            self.current_user_id, 
-            self.update_exchange_rate_label, 
-            self.current_user_role
-        )
+    def _build_page(self, name):
+        """Importa y construye una página funcional (la primera vez que se abre)."""
+        if name == "inventory":
+            from .inventory_page import InventoryPage
+            return InventoryPage(self.content_container, self.db, self.current_user_id, self.current_user_role)
+        if name == "pos":
+            from .pos_page import PosPage
+            return PosPage(self.content_container, self.db, self.current_user_id)
+        if name == "config":
+            from .config_page import ConfigPage # Usaremos este nombre por ahora, pero será nuestro AdminPanel
+            # IMPORTANTE: Pasamos el rol del usuario a ConfigPage (la tasa nueva llega por suscripción)
+            return ConfigPage(
+                self.content_container, 
+                self.db, 
+                self.current_user_id, 
+                self.current_user_role
+            )
+        raise ValueError(f"Página desconocida: {name}")
+
+    def _get_page(self, name):
+        """Devuelve la página `name`, construyéndola si todavía no existe."""
+        page = self.pages.get(name)
+        if page is None:
+            with startup_timing.measure(f"página '{name}'"):
+                page = self._build_page(name)
+                self.pages[name] = page
+            startup_timing.report(f"construcción de '{name}'", since_start=False)
+        return page
 
     def select_frame_by_name(self, name):
         """Muestra la página seleccionada y oculta las demás."""
@@ -205,17 +219,15 @@ class DashboardFrame(ctk.CTkFrame):
         self.pos_button.configure(fg_color="transparent")
         self.config_button.configure(fg_color="transparent")
 
+        self._get_page(name)
         for page_name, page_frame in self.pages.items():
             if page_name == name:
-                current_rate = self.update_exchange_rate_label() 
+                # La tasa ya no se relee aquí: el label y el POS reciben los cambios por suscripción
                 if page_name == "inventory":
                     try:
-                        page_frame.load_products(current_rate)
+                        page_frame.load_products(self.db.get_exchange_rate())
                     except AttributeError:
                         pass
-                elif page_name == "pos":
-                    if hasattr(page_frame, 'update_rate'):
-                        page_frame.update_rate(current_rate)
 
                 page_frame.grid(row=0, column=0, sticky="nsew")
                 self.current_page = page_frame
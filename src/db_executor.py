@@ -0,0 +1,106 @@
+import queue
+import threading
+from concurrent.futures import Future
+
+DRAIN_INTERVAL_MS = 30
+
+
+class QueryExecutor:
+    """Ejecuta operaciones de base de datos en un hilo de trabajo, fuera del hilo de Tk.
+
+    Cada hilo (`workers`, uno por defecto) crea y es dueño de su propia conexión
+    (`db_factory()` debe devolver un DatabaseManager nuevo); con varios hilos el
+    executor funciona como un pool de conexiones que atienden una cola común. `submit(fn, *args)` encola `fn(db_del_hilo, *args)` y
+    devuelve un `concurrent.futures.Future`. Los callbacks no se llaman desde el
+    hilo de trabajo: se dejan en una cola que `attach()` vacía periódicamente con
+    `after()`, de modo que siempre corren en el hilo de Tk.
+
+    Si `db_factory()` falla (archivo bloqueado, servidor caído...) el hilo no muere:
+    cada tarea vuelve a intentar abrir la conexión y, si no puede, su Future falla
+    con ese error y se llama a su `error_callback`.
+    """
+    def __init__(self, db_factory, name="db-worker", workers=1):
+        self.db_factory = db_factory
+        self._tasks = queue.Queue()
+        self._ui_callbacks = queue.Queue()
+        self._widget = None
+        self._threads = [threading.Thread(target=self._run, name=f"{name}-{i}", daemon=True)
+                         for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, fn, *args, callback=None, error_callback=None, **kwargs):
+        future = Future()
+        self._tasks.put((future, fn, args, kwargs, callback, error_callback))
+        return future
+
+    def post(self, callback, *args):
+        """Encola `callback(*args)` para ejecutarse en el hilo de Tk (p. ej. progreso desde el hilo de trabajo)."""
+        self._ui_callbacks.put((callback, args))
+
+    def attach(self, widget, interval_ms=DRAIN_INTERVAL_MS):
+        """Empieza a entregar resultados en el hilo de Tk usando `widget.after`."""
+        self._widget = widget
+        self._interval_ms = interval_ms
+        widget.after(interval_ms, self._drain)
+
+    def shutdown(self, timeout=5):
+        for _ in self._threads:
+            self._tasks.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _run(self):
+        db = self._open()
+        try:
+            while True:
+                item = self._tasks.get()
+                if item is None:
+                    break
+                future, fn, args, kwargs, callback, error_callback = item
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    if db is None:
+                        db = self.db_factory()  # se reintenta; si falla, la tarea falla con ese error
+                    future.set_result(fn(db, *args, **kwargs))
+                except Exception as e:
+                    future.set_exception(e)
+                if callback or error_callback:
+                    self.post(_deliver, future, callback, error_callback)
+        finally:
+            if db is not None:
+                db.close()
+
+    def _open(self):
+        try:
+            return self.db_factory()
+        except Exception as e:
+            print(f"Error al abrir la conexión de {threading.current_thread().name}: {e}")
+            return None
+
+    def _drain(self):
+        while True:
+            try:
+                callback, args = self._ui_callbacks.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                callback(*args)
+            except Exception as e:
+                print(f"Error en callback de consulta en segundo plano: {e}")
+        try:
+            self._widget.after(self._interval_ms, self._drain)
+        except Exception:
+            pass  # la ventana ya fue destruida
+
+
+def _deliver(future, callback, error_callback):
+    error = future.exception()
+    if error is None:
+        if callback:
+            callback(future.result())
+    elif error_callback:
+        error_callback(error)
+    else:
+        print(f"Error en consulta en segundo plano: {error}")
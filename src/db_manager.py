@@ -1,11 +1,141 @@
 import sqlite3
 from sqlite3 import Error
-from datetime import datetime
+from datetime import datetime, timedelta
+import gc
 import hashlib 
+import json
 import os 
-import shutil 
+from collections import namedtuple
+from concurrent.futures import Future
+from contextlib import contextmanager
+from functools import lru_cache, partial
+from pathlib import Path
+from .utils import search_tokens
+from .db_executor import QueryExecutor
+from .migrations import MigrationError, migrate
 
 DB_FILE = 'profitus.db'
+SEARCH_LIMIT = 200
+REPORT_PAGE_SIZE = 100
+READ_POOL_SIZE = 2
+
+# Con PROFITUS_SERVER=http://host:puerto la aplicación usa el servidor de tienda (store_server.py)
+SERVER_URL_ENV = "PROFITUS_SERVER"
+SERVER_TOKEN_ENV = "PROFITUS_SERVER_TOKEN"
+REMOTE_BACKUP_MESSAGE = ("Esta caja está conectada a un servidor de tienda: el backup y la restauración "
+                         "se hacen en el equipo del servidor.")
+
+# Períodos de get_sales_timeseries: expresión que lleva un día a su período y paso al siguiente
+TIMESERIES_BUCKETS = {
+    "day": ("date({})", "+1 day"),
+    "week": ("date({}, '-6 days', 'weekday 1')", "+7 days"),   # lunes de esa semana
+    "month": ("date({}, 'start of month')", "+1 month"),
+}
+
+# Vendedor de cada fila del reporte. Con LEFT JOIN aparecen también las ventas sin usuario o de un
+# usuario eliminado, igual que en ventas_diarias y count_sales: así las filas cuadran con los totales
+SALE_SELLER_COLUMN = "COALESCE(usuarios.nombre_completo, 'Usuario Desconocido') AS nombre_completo"
+
+# Suma (o resta, con valores negativos) una venta al resumen diario ventas_diarias
+DAILY_SALES_UPSERT = """
+    INSERT INTO ventas_diarias (dia, user_id, payment_method, num_ventas, total_bs, total_usd, unidades)
+    VALUES (substr(?, 1, 10), COALESCE(?, 0), COALESCE(?, 'Efectivo'), ?, ?, ?, ?)
+    ON CONFLICT(dia, user_id, payment_method) DO UPDATE SET
+        num_ventas = num_ventas + excluded.num_ventas,
+        total_bs = total_bs + excluded.total_bs,
+        total_usd = total_usd + excluded.total_usd,
+        unidades = unidades + excluded.unidades
+"""
+
+# Las líneas de una venta viajan como un solo parámetro JSON [[producto_id, cantidad], ...],
+# así la validación y el descuento de stock son una sentencia cada uno sin importar el tamaño del ticket.
+# Líneas cuyo producto ya no existe o no tiene stock suficiente
+SALE_STOCK_CHECK = """
+    SELECT json_extract(l.value, '$[0]') AS producto_id, p.id IS NULL AS eliminado, COALESCE(p.stock, 0) AS stock
+    FROM json_each(?) AS l
+    LEFT JOIN productos p ON p.id = json_extract(l.value, '$[0]')
+    WHERE p.id IS NULL OR p.stock < json_extract(l.value, '$[1]')
+"""
+# Descuento protegido: una línea sin stock suficiente no se actualiza y el rowcount lo delata
+SALE_STOCK_DECREMENT = """
+    UPDATE productos SET stock = stock - l.cantidad
+    FROM (SELECT json_extract(value, '$[0]') AS producto_id, json_extract(value, '$[1]') AS cantidad
+          FROM json_each(?)) AS l
+    WHERE productos.id = l.producto_id AND productos.stock >= l.cantidad
+"""
+
+# Ajustes de conexión. En WAL los lectores no bloquean al escritor (ni al revés) y,
+# con synchronous=NORMAL, un commit no espera a un fsync (solo los checkpoints),
+# así que un reporte largo ya no frena las ventas. Se pueden sobreescribir con
+# DatabaseManager(pragmas={...}); None omite el pragma.
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,          # ms que se espera un bloqueo antes de fallar
+    "cache_size": -16000,          # negativo = KiB (~16 MB de caché de páginas)
+    "mmap_size": 64 * 1024 * 1024,
+    "temp_store": "MEMORY",
+}
+# journal_mode es persistente en el archivo y solo lo puede cambiar una conexión de escritura
+WRITER_ONLY_PRAGMAS = ("journal_mode",)
+
+# Sentencias preparadas que guarda cada conexión (sqlite3 usa 128 por omisión). Los reportes
+# arman su SQL según los filtros usados, así que el conjunto de consultas distintas supera ese valor
+STATEMENT_CACHE_SIZE = 512
+
+# Formatos de fila de fetch_one/fetch_all/iter_query:
+#   "row"    sqlite3.Row (acceso por nombre o posición; el de siempre)
+#   "tuple"  tupla simple, la más rápida de leer
+#   "record" namedtuple por conjunto de columnas: tupla con __slots__ vacíos y acceso `fila.columna`
+#   "dict"   diccionario columna -> valor
+ROW_TYPES = ("row", "tuple", "record", "dict")
+FETCH_COLUMNS_BATCH = 20000
+
+@lru_cache(maxsize=256)
+def record_class(columns):
+    """Clase de registro (namedtuple) para una tupla de nombres de columna; se crea una vez por consulta."""
+    return namedtuple("Record", columns, rename=True)
+
+@contextmanager
+def gc_paused():
+    """Pausa el recolector de ciclos mientras se crea un resultado grande.
+
+    Cada fila es un objeto nuevo y, con cientos de miles, el recolector se dispara
+    una y otra vez recorriendo objetos que no pueden formar ciclos (en 1M de filas
+    era casi un tercio del tiempo de lectura).
+    """
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+def decode_rows(description, rows, row_type):
+    """Convierte filas en tupla (cursor sin row_factory) al formato `row_type`."""
+    if row_type == "tuple":
+        return rows
+    columns = tuple(column[0] for column in description)
+    if row_type == "record":
+        # tuple.__new__ directo (en C) en lugar de _make, que es una función Python por fila
+        return list(map(partial(tuple.__new__, record_class(columns)), rows))
+    if row_type == "dict":
+        return [dict(zip(columns, row)) for row in rows]
+    raise ValueError(f"Formato de fila desconocido: {row_type}")
+
+# Tipo de los valores de `configuracion` (se guardan como texto); las claves no listadas son str
+CONFIG_TYPES = {
+    "exchange_rate": float,
+}
+
+def open_database():
+    """DatabaseManager sobre el archivo local o, si PROFITUS_SERVER está definida, cliente del servidor de tienda."""
+    url = os.environ.get(SERVER_URL_ENV)
+    if not url:
+        return DatabaseManager()
+    from .store_server import RemoteDatabaseManager  # solo las cajas conectadas a un servidor cargan http.client
+    return RemoteDatabaseManager(url, token=os.environ.get(SERVER_TOKEN_ENV))
 
 def hash_password(password):
     """Genera un hash SHA-256 para la contraseña."""
@@ -15,34 +145,191 @@ def verify_password(stored_hash, provided_password):
     """Verifica si la contraseña proporcionada coincide con el hash almacenado."""
     return stored_hash == hash_password(provided_password)
 
+def day_range_bounds(start_date=None, end_date=None):
+    """Convierte un rango de días inclusivo ('YYYY-MM-DD') en límites semiabiertos [inicio, fin).
+
+    `ventas.fecha` guarda 'YYYY-MM-DD HH:MM:SS', que se compara bien como texto, así
+    que `fecha >= inicio AND fecha < día siguiente al fin` puede usar el índice de fecha
+    (a diferencia de `date(fecha)`, que obliga a evaluar la función fila por fila).
+    """
+    lower = datetime.strptime(start_date[:10], "%Y-%m-%d").strftime("%Y-%m-%d") if start_date else None
+    upper = None
+    if end_date:
+        upper = (datetime.strptime(end_date[:10], "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+    return lower, upper
+
 class DatabaseManager:
     """Clase para manejar la conexión y las operaciones de la base de datos SQLite."""
+    remote = False  # True en el cliente del servidor de tienda (store_server.RemoteDatabaseManager)
     
-    def __init__(self):
-        self.db_path = DB_FILE 
+    def __init__(self, db_path=DB_FILE, initialize=True, pragmas=None, readonly=False):
+        self.db_path = db_path 
         self.conn = None
+        self.readonly = readonly
+        self._tx_depth = 0          # nivel de anidamiento de transaction()
+        self.pragmas = dict(DEFAULT_PRAGMAS, **(pragmas or {}))
+        self.fts_enabled = False
+        self.executor = None        # hilo de escritura en segundo plano
+        self.read_executor = None   # pool de conexiones de solo lectura
+        self.ui_owner = None  # en el hilo de trabajo: el DatabaseManager del hilo de Tk
+        self._config = None         # caché de la tabla configuracion (clave -> texto)
+        self._config_subscribers = {}
         self.connect()
-        self.create_default_tables() 
-        self.initialize_default_config() 
+        if initialize:
+            try:
+                self.migrate_schema()
+            except MigrationError:
+                self.close()  # quien abrió la base decide cómo avisar; no se sigue con el esquema a medias
+                raise
+            self.initialize_default_config() 
+        else:
+            self.fts_enabled = self._has_fts_index()
 
     def connect(self):
         try:
-            self.conn = sqlite3.connect(self.db_path)
+            if self.readonly:
+                uri = Path(self.db_path).resolve().as_uri() + "?mode=ro"
+                self.conn = sqlite3.connect(uri, uri=True, cached_statements=STATEMENT_CACHE_SIZE)
+            else:
+                self.conn = sqlite3.connect(self.db_path, cached_statements=STATEMENT_CACHE_SIZE)
             self.conn.row_factory = sqlite3.Row 
+            self._apply_pragmas()
             print(f"Conectado a la DB: {self.db_path}")
         except Error as e:
             print(f"Error al conectar con SQLite: {e}")
+
+    def _apply_pragmas(self):
+        for name, value in self.pragmas.items():
+            if value is None or (self.readonly and name in WRITER_ONLY_PRAGMAS):
+                continue
+            try:
+                self.conn.execute(f"PRAGMA {name} = {value}")
+            except Error as e:
+                print(f"No se pudo aplicar PRAGMA {name}: {e}")
+
+    def connection_settings(self):
+        """Valores efectivos de los pragmas de la conexión (útil para diagnóstico)."""
+        return {name: self.conn.execute(f"PRAGMA {name}").fetchone()[0] for name in self.pragmas}
             
+    def start_executor(self, widget, readers=READ_POOL_SIZE):
+        """Arranca el hilo de escritura y el pool de lectores; los resultados se entregan en el hilo de `widget`."""
+        if self.executor is None:
+            self.executor = QueryExecutor(self._create_worker_db)
+            self.executor.attach(widget)
+        if self.read_executor is None and readers:
+            self.read_executor = QueryExecutor(self._create_reader_db, name="db-reader", workers=readers)
+            self.read_executor.attach(widget)
+
+    def _create_worker_db(self, readonly=False):
+        worker_db = DatabaseManager(self.db_path, initialize=False, pragmas=self.pragmas, readonly=readonly)
+        if not worker_db.conn:
+            # connect() solo avisa por consola; el executor necesita el error para rechazar la tarea
+            raise Error(f"No se pudo abrir la base de datos {self.db_path} en el hilo de trabajo.")
+        worker_db.ui_owner = self
+        return worker_db
+
+    def _create_reader_db(self):
+        return self._create_worker_db(readonly=True)
+
+    def submit(self, fn, *args, callback=None, error_callback=None, readonly=False, **kwargs):
+        """Ejecuta `fn(db, *args, **kwargs)` en segundo plano y devuelve un Future.
+
+        `fn` recibe un DatabaseManager con conexión propia del hilo de trabajo, p. ej.
+        `db.submit(DatabaseManager.get_sales_report, inicio, fin, callback=mostrar)`.
+        Con `readonly=True` la tarea va al pool de conexiones de solo lectura, que
+        en modo WAL corre en paralelo con las escrituras del POS.
+        `callback(resultado)` y `error_callback(excepcion)` se llaman en el hilo de Tk.
+        Sin executor (scripts, pruebas) se ejecuta en el momento.
+        """
+        executor = self.read_executor if readonly and self.read_executor is not None else self.executor
+        if executor is not None:
+            return executor.submit(fn, *args, callback=callback, error_callback=error_callback, **kwargs)
+
+        future = Future()
+        try:
+            future.set_result(fn(self, *args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+            if error_callback:
+                error_callback(e)
+            else:
+                print(f"Error en consulta: {e}")
+            return future
+        if callback:
+            callback(future.result())
+        return future
+
+    def post_to_ui(self, callback, *args):
+        """Ejecuta `callback(*args)` en el hilo de Tk; útil para reportar progreso desde `submit`."""
+        if self.ui_owner is not None:
+            self.ui_owner.post_to_ui(callback, *args)
+        elif self.executor is not None:
+            self.executor.post(callback, *args)
+        else:
+            callback(*args)
+
     def close(self):
+        for executor in (self.read_executor, self.executor):
+            if executor is not None:
+                executor.shutdown()
+        self.executor = self.read_executor = None
         if self.conn:
+            if not self.readonly:
+                try:
+                    self.conn.execute("PRAGMA optimize")  # mantiene al día las estadísticas del planificador
+                except Error:
+                    pass
             self.conn.close()
             self.conn = None
             print("Conexión a la DB cerrada.")
 
+    @contextmanager
+    def transaction(self, immediate=False):
+        """Agrupa varias escrituras en una sola transacción (un único commit).
+
+        Dentro del bloque `execute_query` y `execute_many` no hacen commit y, si
+        fallan, lanzan la excepción para que todo el bloque se deshaga. Los bloques
+        anidados usan SAVEPOINT: un error en el interno solo deshace lo suyo si el
+        externo captura la excepción. `immediate=True` toma el bloqueo de escritura
+        al empezar (BEGIN IMMEDIATE) en lugar de en la primera escritura.
+        """
+        depth = self._tx_depth
+        savepoint = f"sp_{depth}"
+        if depth == 0:
+            if self.conn.in_transaction:
+                self.conn.commit()  # cierra la transacción implícita que haya dejado sqlite3
+            self.conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+        else:
+            self.conn.execute(f"SAVEPOINT {savepoint}")
+        self._tx_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._tx_depth -= 1
+            if depth == 0:
+                self.conn.rollback()
+                if self._config is not None:
+                    self.reload_config()  # la caché pudo tomar valores que se acaban de deshacer
+            else:
+                self.conn.execute(f"ROLLBACK TO {savepoint}")
+                self.conn.execute(f"RELEASE {savepoint}")
+            raise
+        self._tx_depth -= 1
+        if depth == 0:
+            self.conn.commit()
+        else:
+            self.conn.execute(f"RELEASE {savepoint}")
+
+    @property
+    def in_transaction(self):
+        return self._tx_depth > 0
+
     def execute_query(self, query, params=()):
         if not self.conn:
             print("Error: Conexión a DB no activa.")
             return None
+        if self.in_transaction:
+            return self.conn.execute(query, params)  # el commit/rollback lo decide transaction()
         try:
             cursor = self.conn.cursor()
             cursor.execute(query, params)
@@ -53,120 +340,111 @@ class DatabaseManager:
             self.conn.rollback() 
             return None
 
-    def fetch_one(self, query, params=()):
+    def execute_many(self, query, rows):
+        """Ejecuta `query` para cada fila de `rows` con executemany, en una sola transacción.
+
+        Devuelve el cursor (`rowcount` suma las filas afectadas) o None si falló,
+        en cuyo caso no se aplica ninguna fila.
+        """
         if not self.conn:
+            print("Error: Conexión a DB no activa.")
             return None
+        if self.in_transaction:
+            return self.conn.executemany(query, rows)
         try:
-            cursor = self.conn.cursor()
-            cursor.execute(query, params)
-            return cursor.fetchone()
+            with self.transaction():
+                return self.conn.executemany(query, rows)
+        except Error as e:
+            print(f"Error al ejecutar consulta por lotes: {e}")
+            return None
+
+    def _cursor(self, query, params, row_type):
+        """Ejecuta `query`; salvo con "row", el cursor devuelve tuplas para decodificarlas por lote."""
+        if row_type == "row":
+            return self.conn.execute(query, params)
+        cursor = self.conn.cursor()
+        cursor.row_factory = None
+        return cursor.execute(query, params)
+
+    def fetch_one(self, query, params=(), row_type="row"):
+        if not self.conn:
+            return None
+        try:
+            cursor = self._cursor(query, params, row_type)
+            row = cursor.fetchone()
+            if row is None or row_type == "row":
+                return row
+            return decode_rows(cursor.description, [row], row_type)[0]
         except Error as e:
             print(f"Error al obtener una fila: {e}")
             return None
 
-    def fetch_all(self, query, params=()):
+    def fetch_all(self, query, params=(), row_type="row"):
+        """Todas las filas del resultado, en el formato `row_type` (ver ROW_TYPES)."""
         if not self.conn:
             return []
         try:
-            cursor = self.conn.cursor()
-            cursor.execute(query, params)
-            return cursor.fetchall()
+            with gc_paused():
+                cursor = self._cursor(query, params, row_type)
+                rows = cursor.fetchall()
+                if row_type == "row":
+                    return rows
+                return decode_rows(cursor.description, rows, row_type)
         except Error as e:
             print(f"Error al obtener todas las filas: {e}")
             return []
 
-    def _check_and_add_column(self, table_name, column_name, column_type):
+    def fetch_columns(self, query, params=()):
+        """Resultado por columnas: {columna: [valores...]}, sin crear un objeto por fila.
+
+        Conviene para series y agregados que se recorren columna por columna (gráficos, totales).
+        """
         if not self.conn:
-            return
+            return {}
         try:
-            cursor = self.conn.execute(f"PRAGMA table_info({table_name})")
-            columns = [info[1] for info in cursor.fetchall()]
-            if column_name not in columns:
-                self.execute_query(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type}")
-                print(f"Columna '{column_name}' añadida a la tabla '{table_name}'.")
-        except sqlite3.OperationalError:
-            pass
-        except Exception as e:
-            print(f"Error al verificar/añadir columna {column_name} en {table_name}: {e}")
-
-    def create_default_tables(self):
-        self.execute_query("""
-            CREATE TABLE IF NOT EXISTS usuarios (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT NOT NULL UNIQUE,
-                password TEXT NOT NULL,
-                nombre_completo TEXT,
-                rol TEXT NOT NULL DEFAULT 'Cajero',
-                foto_path TEXT
-            )
-        """)
-        self.execute_query("""
-            CREATE TABLE IF NOT EXISTS productos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                codigo TEXT NOT NULL UNIQUE,
-                nombre TEXT NOT NULL,
-                stock REAL NOT NULL DEFAULT 0,
-                precio_venta REAL NOT NULL, 
-                precio_costo REAL NOT NULL, 
-                categoria TEXT
-            )
-        """)
-
-        self._check_and_add_column('productos', 'proveedor', 'TEXT')
-        self._check_and_add_column('productos', 'stock_minimo', 'REAL NOT NULL DEFAULT 0')
-        self._check_and_add_column('productos', 'marca', 'TEXT')
-        self._check_and_add_column('productos', 'categoria', 'TEXT')
-        self._check_and_add_column('usuarios', 'foto_path', 'TEXT') 
-        self._check_and_add_column('usuarios', 'nombre_completo', 'TEXT')
-
-        self.execute_query("""
-            CREATE TABLE IF NOT EXISTS configuracion (
-                key TEXT PRIMARY KEY,
-                value TEXT NOT NULL
-            )
-        """)
-        self.execute_query("""
-            CREATE TABLE IF NOT EXISTS ventas (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                fecha TEXT NOT NULL,
-                total_bs REAL NOT NULL,
-                total_usd REAL NOT NULL, 
-                tasa_cambio REAL NOT NULL,
-                user_id INTEGER,
-                payment_method TEXT DEFAULT 'Efectivo',
-                amount_received REAL DEFAULT 0.0,
-                change_given REAL DEFAULT 0.0,
-                mobile_payment_id TEXT DEFAULT NULL,
-                FOREIGN KEY (user_id) REFERENCES usuarios(id)
-            )
-        """)
-        self.execute_query("""
-            CREATE TABLE IF NOT EXISTS detalles_venta (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                venta_id INTEGER NOT NULL,
-                producto_id INTEGER NOT NULL,
-                nombre_producto TEXT NOT NULL,
-                cantidad REAL NOT NULL,
-                precio_unitario_usd REAL NOT NULL,
-                precio_unitario_bs REAL NOT NULL,
-                subtotal_usd REAL NOT NULL,
-                subtotal_bs REAL NOT NULL,
-                FOREIGN KEY (venta_id) REFERENCES ventas(id),
-                FOREIGN KEY (producto_id) REFERENCES productos(id)
-            )
-        """)
-
-        self._check_and_add_column('detalles_venta', 'precio_unitario_bs', 'REAL NOT NULL DEFAULT 0.0')
-        self._check_and_add_column('detalles_venta', 'subtotal_bs', 'REAL NOT NULL DEFAULT 0.0')
-        self._check_and_add_column('detalles_venta', 'precio_unitario_usd', 'REAL NOT NULL DEFAULT 0.0')
-        self._check_and_add_column('detalles_venta', 'subtotal_usd', 'REAL NOT NULL DEFAULT 0.0')
-        self._check_and_add_column('ventas', 'user_id', 'INTEGER')
-        self._check_and_add_column('ventas', 'payment_method', "TEXT DEFAULT 'Efectivo'")
-        self._check_and_add_column('ventas', 'amount_received', "REAL DEFAULT 0.0")
-        self._check_and_add_column('ventas', 'change_given', "REAL DEFAULT 0.0")
-        self._check_and_add_column('ventas', 'mobile_payment_id', "TEXT DEFAULT NULL")
+            with gc_paused():
+                cursor = self._cursor(query, params, "tuple")
+                names = [column[0] for column in cursor.description]
+                columns = [[] for _ in names]
+                # Por lotes: se transpone cada lote sin tener todas las tuplas en memoria a la vez
+                while True:
+                    rows = cursor.fetchmany(FETCH_COLUMNS_BATCH)
+                    if not rows:
+                        break
+                    for column, values in zip(columns, zip(*rows)):
+                        column.extend(values)
+        except Error as e:
+            print(f"Error al obtener columnas: {e}")
+            return {}
+        return dict(zip(names, columns))
+
+    def migrate_schema(self):
+        """Lleva el esquema a la última versión (ver migrations.py); sin DDL si ya está al día."""
+        migrate(self)
+        self.fts_enabled = self._has_fts_index()
+
+    def _has_fts_index(self):
+        return self.fetch_one("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'productos_fts'") is not None
+
+    def rebuild_daily_sales(self):
+        """Recalcula ventas_diarias a partir de ventas y detalles_venta."""
+        with self.transaction():
+            self.execute_query("DELETE FROM ventas_diarias")
+            self.execute_query("""
+                INSERT INTO ventas_diarias (dia, user_id, payment_method, num_ventas, total_bs, total_usd, unidades)
+                SELECT substr(v.fecha, 1, 10), COALESCE(v.user_id, 0), COALESCE(v.payment_method, 'Efectivo'),
+                       COUNT(*), SUM(v.total_bs), SUM(v.total_usd), COALESCE(SUM(d.unidades), 0)
+                FROM ventas v
+                LEFT JOIN (SELECT venta_id, SUM(cantidad) AS unidades FROM detalles_venta GROUP BY venta_id) d
+                       ON d.venta_id = v.id
+                GROUP BY 1, 2, 3
+            """)
 
     def initialize_default_config(self):
+        with self.transaction():
+            self._seed_default_data()
+
+    def _seed_default_data(self):
         hashed_password = hash_password("1234")
 
         if not self.fetch_one("SELECT id FROM usuarios WHERE username = 'admin'"):
@@ -188,8 +466,7 @@ class DatabaseManager:
                 (codigo, nombre, stock, precio_venta, precio_costo, categoria, proveedor, stock_minimo, marca) 
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
             """
-            for prod in products_to_insert:
-                self.execute_query(sql_insert, prod)
+            self.execute_many(sql_insert, products_to_insert)
             print("Productos de prueba insertados con datos USD y campos extendidos.")
         
         if not self.fetch_one("SELECT key FROM configuracion WHERE key = 'exchange_rate'"):
@@ -212,8 +489,8 @@ class DatabaseManager:
                 return user_row 
         return None
     
-    def get_all_users(self):
-        return self.fetch_all("SELECT id, username, nombre_completo, rol, foto_path FROM usuarios")
+    def get_all_users(self, row_type="row"):
+        return self.fetch_all("SELECT id, username, nombre_completo, rol, foto_path FROM usuarios", row_type=row_type)
     
     def create_user(self, username, password, full_name, role, foto_path=None):
         hashed_pw = hash_password(password)
@@ -250,31 +527,78 @@ class DatabaseManager:
         row = self.fetch_one("SELECT foto_path FROM usuarios WHERE id = ?", (user_id,))
         return row['foto_path'] if row else None
 
+    def _config_values(self):
+        """Caché de la tabla configuracion: se lee completa la primera vez y luego se mantiene en memoria."""
+        if self._config is None:
+            self._config = {row['key']: row['value'] for row in self.fetch_all("SELECT key, value FROM configuracion")}
+        return self._config
+
+    def get_config(self, key, default=None):
+        """Valor de `key` convertido según CONFIG_TYPES, o `default` si no existe o no es válido."""
+        raw = self._config_values().get(key)
+        if raw is None:
+            return default
+        try:
+            return CONFIG_TYPES.get(key, str)(raw)
+        except ValueError:
+            print(f"Advertencia: El valor de configuración '{key}' no es válido: {raw!r}")
+            return default
+
     def get_company_config(self, key):
-        row = self.fetch_one("SELECT value FROM configuracion WHERE key = ?", (key,))
-        return row['value'] if row else None
+        return self._config_values().get(key)
 
     def set_company_config(self, key, value):
-        self.execute_query("""
+        """Guarda `value` en la DB y, si se guardó, actualiza la caché y avisa a los suscriptores."""
+        value = str(value)
+        cursor = self.execute_query("""
             INSERT OR REPLACE INTO configuracion (key, value)
             VALUES (?, ?)
-        """, (key, str(value)))
+        """, (key, value))
+        if cursor is None:
+            return False
 
-    def get_exchange_rate(self):
-        row = self.fetch_one("SELECT value FROM configuracion WHERE key = 'exchange_rate'")
-        if row:
+        values = self._config_values()
+        changed = values.get(key) != value
+        values[key] = value
+        if changed:
+            self._notify_config(key)
+            if self.ui_owner is not None:
+                # Escrito desde un hilo de trabajo: la caché del hilo de Tk se recarga allí
+                self.post_to_ui(self.ui_owner.reload_config)
+        return True
+
+    def subscribe_config(self, key, callback):
+        """Llama a `callback(valor)` cada vez que cambia `key` (con el tipo de CONFIG_TYPES)."""
+        self._config_subscribers.setdefault(key, []).append(callback)
+        return callback
+
+    def unsubscribe_config(self, key, callback):
+        callbacks = self._config_subscribers.get(key, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+
+    def _notify_config(self, key):
+        value = self.get_config(key)
+        for callback in list(self._config_subscribers.get(key, ())):
             try:
-                return float(row['value']) 
-            except ValueError:
-                print("Advertencia: El valor de la tasa de cambio no es un número válido.")
-                return 0.0 
-        return 0.0 
+                callback(value)
+            except Exception as e:
+                print(f"Error al notificar el cambio de '{key}': {e}")
+
+    def reload_config(self):
+        """Vuelve a leer la configuración (p. ej. tras restaurar un backup) y avisa de lo que cambió."""
+        old_values = self._config or {}
+        self._config = None
+        new_values = self._config_values()
+        for key in set(old_values) | set(new_values):
+            if old_values.get(key) != new_values.get(key):
+                self._notify_config(key)
+
+    def get_exchange_rate(self):
+        return self.get_config("exchange_rate", 0.0)
 
     def set_exchange_rate(self, rate):
-        self.execute_query("""
-            INSERT OR REPLACE INTO configuracion (key, value)
-            VALUES ('exchange_rate', ?)
-        """, (str(rate),))
+        return self.set_company_config("exchange_rate", rate)
 
     def perform_backup(self, destination_path):
         if not self.conn:
@@ -298,31 +622,100 @@ class DatabaseManager:
         if not os.path.exists(source_path):
             return False, "Error: El archivo de backup de origen no fue encontrado."
 
-        main_db_path = self.db_path
-
-        try:
-            self.close()
-        except Exception as e:
-            self.connect() 
-            return False, f"Error al intentar cerrar la conexión a la DB: {e}"
+        if not self.conn:
+            return False, "La conexión a la base de datos no está activa."
 
+        # En modo WAL no se puede copiar el archivo encima de la base abierta (las
+        # páginas pendientes en -wal la corromperían); la API de backup escribe sobre
+        # la conexión viva y el resto de conexiones ve el cambio como una transacción más.
         try:
-            shutil.copy2(source_path, main_db_path) 
-            self.connect() 
+            source_conn = sqlite3.connect(source_path)
+            try:
+                source_conn.backup(self.conn)
+            finally:
+                source_conn.close()
+            self.migrate_schema()  # un backup antiguo puede tener un esquema anterior
+            self.reload_config()
             return True, f"Base de datos restaurada exitosamente desde: {source_path}"
             
-        except shutil.Error as e:
-            self.connect() 
-            return False, f"Error de copia de archivo (permisos o en uso): {e}"
+        except sqlite3.Error as e:
+            return False, f"Error de SQLite (archivo inválido o base en uso): {e}"
             
         except Exception as e:
-            self.connect() 
             return False, f"Error inesperado durante la restauración: {e}"
 
     def get_all_products(self):
         query = "SELECT * FROM productos ORDER BY nombre COLLATE NOCASE ASC"
         return self.fetch_all(query)
 
+    def count_products(self):
+        row = self.fetch_one("SELECT COUNT(*) FROM productos")
+        return row[0] if row else 0
+
+    def get_products_page(self, key=None, limit=50, direction="next"):
+        """Página de productos ordenada por (nombre COLLATE NOCASE, id) con paginación por clave.
+
+        `key` es la tupla (nombre, id) de referencia. `direction`:
+        'next' devuelve las filas posteriores a `key`, 'from' incluye `key` y
+        'prev' devuelve las anteriores. Las filas siempre vienen en orden ascendente.
+        """
+        if key is None:
+            query = "SELECT * FROM productos ORDER BY nombre COLLATE NOCASE, id LIMIT ?"
+            return self.fetch_all(query, (limit,))
+
+        # Se expande la comparación de tuplas para que SQLite pueda hacer SEARCH sobre el índice
+        if direction == "prev":
+            query = """
+                SELECT * FROM productos
+                WHERE nombre COLLATE NOCASE <= ?1 AND (nombre COLLATE NOCASE < ?1 OR id < ?2)
+                ORDER BY nombre COLLATE NOCASE DESC, id DESC LIMIT ?3
+            """
+            return self.fetch_all(query, (key[0], key[1], limit))[::-1]
+
+        operator = ">=" if direction == "from" else ">"
+        query = f"""
+            SELECT * FROM productos
+            WHERE nombre COLLATE NOCASE >= ?1 AND (nombre COLLATE NOCASE > ?1 OR id {operator} ?2)
+            ORDER BY nombre COLLATE NOCASE, id LIMIT ?3
+        """
+        return self.fetch_all(query, (key[0], key[1], limit))
+
+    def get_product_key_at(self, offset):
+        """Clave (nombre, id) del producto en la posición `offset`; recorre solo el índice."""
+        query = "SELECT nombre, id FROM productos ORDER BY nombre COLLATE NOCASE, id LIMIT 1 OFFSET ?"
+        row = self.fetch_one(query, (max(0, offset),))
+        return (row[0], row[1]) if row else None
+
+    def search_products(self, term, limit=SEARCH_LIMIT):
+        """Busca productos por código, nombre, marca, categoría o proveedor.
+
+        Cada palabra de `term` se trata como prefijo, sin distinguir mayúsculas ni
+        acentos, y los resultados vienen ordenados por relevancia (una coincidencia
+        exacta de código va primero).
+        """
+        tokens = search_tokens(term)
+        if not tokens:
+            return []
+
+        if self.fts_enabled:
+            match = " ".join('"' + token.replace('"', '""') + '"*' for token in tokens)
+            query = """
+                SELECT p.* FROM productos_fts
+                JOIN productos p ON p.id = productos_fts.rowid
+                WHERE productos_fts MATCH ?
+                ORDER BY (p.codigo = ?) DESC, bm25(productos_fts, 10.0, 5.0, 2.0, 1.0, 1.0)
+                LIMIT ?
+            """
+            return self.fetch_all(query, (match, term.strip().upper(), limit))
+
+        conditions = []
+        params = []
+        for token in tokens:
+            conditions.append("(codigo LIKE ? OR nombre LIKE ? OR marca LIKE ? OR categoria LIKE ? OR proveedor LIKE ?)")
+            params.extend([f"%{token}%"] * 5)
+        query = f"SELECT * FROM productos WHERE {' AND '.join(conditions)} ORDER BY nombre COLLATE NOCASE LIMIT ?"
+        return self.fetch_all(query, tuple(params) + (limit,))
+
     def get_product_by_id(self, product_id):
         query = "SELECT * FROM productos WHERE id = ?"
         return self.fetch_one(query, (product_id,))
@@ -331,6 +724,26 @@ class DatabaseManager:
         query = "SELECT * FROM productos WHERE codigo = ?"
         return self.fetch_one(query, (codigo,))
 
+    def get_catalog_version(self):
+        """Versión actual del catálogo; cambia solo cuando se modifica algún producto."""
+        row = self.fetch_one("SELECT COALESCE(MAX(version), 0) FROM productos_cambios")
+        return row[0] if row else 0
+
+    def get_product_changes(self, since_version):
+        """Devuelve los productos modificados desde `since_version`.
+
+        Cada fila trae `producto_id`, `version` y las columnas del producto; si el
+        producto fue eliminado, las columnas del producto (incluido `id`) vienen en NULL.
+        """
+        query = """
+            SELECT c.producto_id, c.version, p.*
+            FROM productos_cambios c
+            LEFT JOIN productos p ON p.id = c.producto_id
+            WHERE c.version > ?
+            ORDER BY c.version
+        """
+        return self.fetch_all(query, (since_version,))
+
     def create_product(self, codigo, nombre, stock, precio_venta, precio_costo, categoria, proveedor, stock_minimo, marca):
         sql = """
             INSERT INTO productos (codigo, nombre, stock, precio_venta, precio_costo, categoria, proveedor, stock_minimo, marca) 
@@ -348,89 +761,340 @@ class DatabaseManager:
         """
         return self.execute_query(sql, (codigo, nombre, stock, precio_venta, precio_costo, categoria, proveedor, stock_minimo, marca, product_id))
 
+    def update_product_prices(self, prices):
+        """Actualiza precios en lote: `prices` es un iterable de (codigo, precio_venta, precio_costo).
+
+        Todo se aplica en una sola transacción (o ninguno, si hay un error).
+        """
+        cursor = self.execute_many(
+            "UPDATE productos SET precio_venta = ?, precio_costo = ? WHERE codigo = ?",
+            ((precio_venta, precio_costo, codigo) for codigo, precio_venta, precio_costo in prices)
+        )
+        if cursor is None:
+            return False, "No se pudieron actualizar los precios."
+        return True, f"{cursor.rowcount} precios actualizados."
+
     def delete_product(self, product_id):
         return self.execute_query("DELETE FROM productos WHERE id = ?", (product_id,))
 
     def process_sale_transaction(self, cart_data, total_final_usd, current_rate, user_id, payment_method='Efectivo', amount_received=0.0, change_given=0.0, mobile_payment_id=None):
+        """Registra la venta, sus líneas y el descuento de stock en una sola transacción.
+
+        Se abre con BEGIN IMMEDIATE: el bloqueo de escritura se toma antes de
+        leer el stock, así que dos cajas no pueden vender la misma última unidad.
+        El stock se valida contra la base (no contra el `stock_real` del carrito)
+        y se descuenta con un UPDATE protegido; si alguna línea no alcanza, la
+        venta completa se deshace.
+        """
         if not self.conn:
             return False, "Conexión a la DB no activa para la venta."
 
-        conn = self.conn
-        cursor = conn.cursor()
-
-        for p_id, data in cart_data.items():
-            cantidad_vendida = data['cantidad']
-            stock_real = data.get('stock_real', 0) 
-            if stock_real < cantidad_vendida:
-                return False, f"Stock insuficiente (solo quedan {stock_real}) para el producto: {data['nombre']}."
+        lines = json.dumps([[p_id, data['cantidad']] for p_id, data in cart_data.items()])
+        fecha_venta = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        total_final_bs = total_final_usd * current_rate
 
         try:
-            fecha_venta = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            total_final_bs = total_final_usd * current_rate 
-
-            cursor.execute("""
-                INSERT INTO ventas (fecha, total_bs, total_usd, tasa_cambio, user_id, payment_method, amount_received, change_given, mobile_payment_id)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (fecha_venta, total_final_bs, total_final_usd, current_rate, user_id, payment_method, amount_received, change_given, mobile_payment_id))
-
-            venta_id = cursor.lastrowid
+            with self.transaction(immediate=True):
+                shortages = self.conn.execute(SALE_STOCK_CHECK, (lines,)).fetchall()
+                if shortages:
+                    # Todavía no se escribió nada: la transacción termina vacía
+                    return False, self._stock_shortage_message(shortages[0], cart_data)
 
-            for p_id, data in cart_data.items():
-                cantidad = data['cantidad']
-                precio_unitario_usd = data['precio_usd']
-                precio_unitario_bs = precio_unitario_usd * current_rate
-                subtotal_usd = cantidad * precio_unitario_usd
-                subtotal_bs = cantidad * precio_unitario_bs
+                cursor = self.conn.execute("""
+                    INSERT INTO ventas (fecha, total_bs, total_usd, tasa_cambio, user_id, payment_method, amount_received, change_given, mobile_payment_id)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (fecha_venta, total_final_bs, total_final_usd, current_rate, user_id, payment_method, amount_received, change_given, mobile_payment_id))
+                venta_id = cursor.lastrowid
 
-                cursor.execute("""
+                self.conn.executemany("""
                     INSERT INTO detalles_venta (
-                        venta_id, producto_id, nombre_producto, cantidad, 
+                        venta_id, producto_id, nombre_producto, cantidad,
                         precio_unitario_usd, precio_unitario_bs, subtotal_usd, subtotal_bs
                     )
                     VALUES (?, ?, ?, ?, ?, ?, ?, ?)
                 """, (
-                    venta_id, p_id, data['nombre'], cantidad,
-                    precio_unitario_usd, precio_unitario_bs, subtotal_usd, subtotal_bs
+                    (venta_id, p_id, data['nombre'], data['cantidad'],
+                     data['precio_usd'], data['precio_usd'] * current_rate,
+                     data['cantidad'] * data['precio_usd'], data['cantidad'] * data['precio_usd'] * current_rate)
+                    for p_id, data in cart_data.items()
                 ))
 
-                cursor.execute("""
-                    UPDATE productos SET stock = stock - ? WHERE id = ?
-                """, (cantidad, p_id))
+                if self.conn.execute(SALE_STOCK_DECREMENT, (lines,)).rowcount != len(cart_data):
+                    raise Error("el stock cambió durante la venta")  # deshace la venta completa
 
-            conn.commit()
-            return True, f"Venta {venta_id} procesada con éxito."
+                # El resumen diario se actualiza en la misma transacción que la venta
+                unidades = sum(data['cantidad'] for data in cart_data.values())
+                self.conn.execute(DAILY_SALES_UPSERT, (fecha_venta, user_id, payment_method, 1, total_final_bs, total_final_usd, unidades))
 
         except Error as e:
-            conn.rollback()
             print(f"Error fatal de SQL en la transacción de venta: {e}")
             return False, f"Error de base de datos: {e}"
         except Exception as e:
-            conn.rollback()
             print(f"Error inesperado en la transacción de venta: {e}")
             return False, f"Error inesperado: {e}"
+        return True, f"Venta {venta_id} procesada con éxito."
+
+    def _stock_shortage_message(self, shortage, cart_data):
+        nombre = cart_data.get(shortage['producto_id'])['nombre']
+        if shortage['eliminado']:
+            return f"El producto '{nombre}' ya no existe en el inventario."
+        return f"Stock insuficiente (solo quedan {shortage['stock']}) para el producto: {nombre}."
+
+    def _sales_report_filters(self, start_date=None, end_date=None, seller=None):
+        """Condiciones (" AND ...") y parámetros del filtro de fechas y vendedor sobre `ventas`."""
+        conditions = ""
+        params = []
+
+        lower, upper = day_range_bounds(start_date, end_date)
+        if lower:
+            conditions += " AND ventas.fecha >= ?"
+            params.append(lower)
+        if upper:
+            conditions += " AND ventas.fecha < ?"
+            params.append(upper)
+        if seller:
+            # Filtrar por user_id permite usar idx_ventas_user_fecha
+            conditions += " AND ventas.user_id IN (SELECT id FROM usuarios WHERE nombre_completo = ?)"
+            params.append(seller)
+        return conditions, tuple(params)
+
+    def _build_sales_report_query(self, start_date=None, end_date=None, seller=None, after=None, limit=None):
+        """Consulta del reporte, de la venta más reciente a la más antigua.
+
+        Con `after=(fecha, id)` devuelve solo las ventas posteriores a esa en el orden
+        del reporte (paginación por clave), y con `limit` como máximo esa cantidad.
+        """
+        conditions, params = self._sales_report_filters(start_date, end_date, seller)
+        if after:
+            # (fecha, id) < (?, ?) expandido para que SQLite lo resuelva como rango del índice
+            conditions += " AND ventas.fecha <= ? AND (ventas.fecha < ? OR ventas.id < ?)"
+            params += (after[0], after[0], after[1])
+        query = f"""
+            SELECT ventas.id, ventas.fecha, {SALE_SELLER_COLUMN}, ventas.total_bs, ventas.total_usd 
+            FROM ventas 
+            LEFT JOIN usuarios ON ventas.user_id = usuarios.id
+            WHERE 1=1 {conditions}
+            ORDER BY ventas.fecha DESC, ventas.id DESC
+        """
+        if limit:
+            query += " LIMIT ?"
+            params += (limit,)
+        return query, params
+
+    def _build_sales_export_query(self, start_date=None, end_date=None, seller=None, include_details=False):
+        """Consulta del reporte de ventas para exportar; con `include_details` una fila por producto vendido."""
+        if not include_details:
+            return self._build_sales_report_query(start_date, end_date, seller)
+        conditions, params = self._sales_report_filters(start_date, end_date, seller)
+        # Mismo orden de ventas que el reporte en pantalla; dentro de cada venta, por línea
+        query = f"""
+            SELECT ventas.id, ventas.fecha, {SALE_SELLER_COLUMN}, ventas.total_bs, ventas.total_usd,
+                   d.producto_id, d.nombre_producto, d.cantidad, d.precio_unitario_usd,
+                   d.precio_unitario_bs, d.subtotal_usd, d.subtotal_bs
+            FROM ventas 
+            LEFT JOIN usuarios ON ventas.user_id = usuarios.id
+            LEFT JOIN detalles_venta d ON d.venta_id = ventas.id
+            WHERE 1=1 {conditions}
+            ORDER BY ventas.fecha DESC, ventas.id DESC, d.id
+        """
+        return query, params
+
+    def count_sales(self, start_date=None, end_date=None, seller=None, include_details=False):
+        """Cantidad de filas que devolvería la exportación con esos filtros (para mostrar el avance)."""
+        conditions, params = self._sales_report_filters(start_date, end_date, seller)
+        if include_details:
+            query = f"SELECT COUNT(*) FROM ventas LEFT JOIN detalles_venta d ON d.venta_id = ventas.id WHERE 1=1 {conditions}"
+        else:
+            query = f"SELECT COUNT(*) FROM ventas WHERE 1=1 {conditions}"
+        row = self.fetch_one(query, params)
+        return row[0] if row else 0
+
+    def iter_sales_export(self, start_date=None, end_date=None, seller=None, include_details=False, batch_size=1000):
+        """Lotes de filas del reporte de ventas para exportar (ver sales_export.export_sales)."""
+        query, params = self._build_sales_export_query(start_date, end_date, seller, include_details)
+        return self.iter_query(query, params, batch_size, row_type="tuple")  # el csv.writer solo necesita tuplas
+
+    def iter_query(self, query, params=(), batch_size=1000, row_type="row"):
+        """Recorre el resultado en lotes de `batch_size` filas (fetchmany) sin cargarlo completo en memoria."""
+        cursor = self._cursor(query, params, row_type)
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows if row_type in ("row", "tuple") else decode_rows(cursor.description, rows, row_type)
+        finally:
+            cursor.close()
 
     def get_sales_report(self, start_date=None, end_date=None, seller=None):
+        query, params = self._build_sales_report_query(start_date, end_date, seller)
+        return self.fetch_all(query, params)
+
+    def get_sales_report_page(self, start_date=None, end_date=None, seller=None, after=None, limit=REPORT_PAGE_SIZE,
+                              row_type="row"):
+        """Una página del reporte: hasta `limit` ventas siguientes a la clave `after` = (fecha, id) de la última fila vista."""
+        query, params = self._build_sales_report_query(start_date, end_date, seller, after, limit)
+        return self.fetch_all(query, params, row_type=row_type)
+
+    def get_sales_report_totals(self, start_date=None, end_date=None, seller=None):
+        """Totales de todo el rango filtrado (num_ventas, total_bs, total_usd), leídos de ventas_diarias."""
+        conditions, params = self._daily_sales_filters(start_date, end_date, seller)
+        return self.fetch_one(f"""
+            SELECT COALESCE(SUM(num_ventas), 0) AS num_ventas, COALESCE(SUM(total_bs), 0.0) AS total_bs,
+                   COALESCE(SUM(total_usd), 0.0) AS total_usd
+            FROM ventas_diarias WHERE 1=1 {conditions}
+        """, params)
+
+    def get_sale_details(self, venta_id):
         query = """
-            SELECT ventas.id, ventas.fecha, usuarios.nombre_completo, ventas.total_bs, ventas.total_usd 
-            FROM ventas 
-            JOIN usuarios ON ventas.user_id = usuarios.id
-            WHERE 1=1
+            SELECT nombre_producto, cantidad, precio_unitario_usd, precio_unitario_bs, subtotal_usd, subtotal_bs, id
+            FROM detalles_venta WHERE venta_id = ?
         """
-        params = []
+        return self.fetch_all(query, (venta_id,))
+
+    def _get_sale_line(self, detalle_id):
+        return self.fetch_one("""
+            SELECT d.venta_id, d.cantidad, d.precio_unitario_usd, d.precio_unitario_bs, d.subtotal_usd, d.subtotal_bs,
+                   v.fecha, v.user_id, v.payment_method
+            FROM detalles_venta d JOIN ventas v ON v.id = d.venta_id
+            WHERE d.id = ?
+        """, (detalle_id,))
+
+    def _apply_sale_line_delta(self, line, delta_cantidad, delta_usd, delta_bs):
+        """Corrige los totales de la venta y el resumen diario tras modificar una de sus líneas."""
+        self.execute_query("UPDATE ventas SET total_usd = total_usd + ?, total_bs = total_bs + ? WHERE id = ?",
+                           (delta_usd, delta_bs, line['venta_id']))
+        self.execute_query(DAILY_SALES_UPSERT, (line['fecha'], line['user_id'], line['payment_method'],
+                                                0, delta_bs, delta_usd, delta_cantidad))
 
-        if start_date:
-            query += " AND date(ventas.fecha) >= date(?)"
-            params.append(start_date)
-        if end_date:
-            query += " AND date(ventas.fecha) <= date(?)"
-            params.append(end_date)
+    def update_sale_line_quantity(self, detalle_id, new_quantity):
+        """Cambia la cantidad de una línea de venta, recalculando subtotales, total de la venta y resumen diario."""
+        try:
+            # La línea se lee ya con el bloqueo de escritura: los deltas salen de la fila que se modifica
+            with self.transaction(immediate=True):
+                line = self._get_sale_line(detalle_id)
+                if not line:
+                    return False, "La línea de venta no existe."
+                new_subtotal_usd = line['precio_unitario_usd'] * new_quantity
+                new_subtotal_bs = line['precio_unitario_bs'] * new_quantity
+                self.execute_query("UPDATE detalles_venta SET cantidad = ?, subtotal_usd = ?, subtotal_bs = ? WHERE id = ?",
+                                   (new_quantity, new_subtotal_usd, new_subtotal_bs, detalle_id))
+                self._apply_sale_line_delta(line, new_quantity - line['cantidad'],
+                                            new_subtotal_usd - line['subtotal_usd'],
+                                            new_subtotal_bs - line['subtotal_bs'])
+        except Error as e:
+            print(f"Error al actualizar la línea de venta: {e}")
+            return False, f"Error de base de datos: {e}"
+        return True, "Cantidad actualizada correctamente."
+
+    def delete_sale_line(self, detalle_id):
+        """Elimina una línea de venta y descuenta su importe de la venta y del resumen diario."""
+        try:
+            with self.transaction(immediate=True):
+                line = self._get_sale_line(detalle_id)
+                if not line:
+                    return False, "La línea de venta no existe."
+                self.execute_query("DELETE FROM detalles_venta WHERE id = ?", (detalle_id,))
+                self._apply_sale_line_delta(line, -line['cantidad'], -line['subtotal_usd'], -line['subtotal_bs'])
+        except Error as e:
+            print(f"Error al eliminar la línea de venta: {e}")
+            return False, f"Error de base de datos: {e}"
+        return True, "Producto eliminado correctamente."
+
+    def _daily_sales_filters(self, start_date=None, end_date=None, seller=None):
+        """Como _sales_report_filters, pero sobre el resumen ventas_diarias."""
+        conditions = ""
+        params = []
+        lower, upper = day_range_bounds(start_date, end_date)
+        if lower:
+            conditions += " AND dia >= ?"
+            params.append(lower)
+        if upper:
+            conditions += " AND dia < ?"
+            params.append(upper)
         if seller:
-            query += " AND usuarios.nombre_completo = ?"
+            conditions += " AND user_id IN (SELECT id FROM usuarios WHERE nombre_completo = ?)"
             params.append(seller)
+        return conditions, tuple(params)
 
-        query += " ORDER BY ventas.fecha DESC"
+    def get_sales_timeseries(self, start_date=None, end_date=None, granularity="day", seller=None):
+        """Serie de ventas por día, semana (desde el lunes) o mes, agregada en SQLite desde ventas_diarias.
 
-        return self.fetch_all(query, tuple(params))
+        Los períodos sin ventas se rellenan con 0, así que hay un valor por período
+        entre `start_date` y `end_date` (o entre la primera y la última venta si no
+        se indican). Devuelve listas paralelas:
+        {"periodos": [...], "num_ventas": [...], "total_bs": [...], "total_usd": [...], "unidades": [...]}.
+        """
+        series = {"periodos": [], "num_ventas": [], "total_bs": [], "total_usd": [], "unidades": []}
+        if granularity not in TIMESERIES_BUCKETS:
+            print(f"Error: agrupación de la serie de ventas desconocida: {granularity!r}")
+            return series
+        bucket, step = TIMESERIES_BUCKETS[granularity]
+        filters, params = self._daily_sales_filters(start_date, end_date, seller)
+
+        first_day = start_date[:10] if start_date else None
+        last_day = end_date[:10] if end_date else None
+        if not first_day or not last_day:
+            bounds = self.fetch_one(f"SELECT MIN(dia), MAX(dia) FROM ventas_diarias WHERE 1=1 {filters}", params)
+            first_day = first_day or (bounds[0] if bounds else None)
+            last_day = last_day or (bounds[1] if bounds else None)
+        if not first_day or not last_day:
+            return series
+
+        query = f"""
+            WITH RECURSIVE periodos(periodo) AS (
+                SELECT {bucket.format("?")}
+                UNION ALL
+                SELECT date(periodo, '{step}') FROM periodos WHERE date(periodo, '{step}') <= {bucket.format("?")}
+            ),
+            totales AS (
+                SELECT {bucket.format("dia")} AS periodo, SUM(num_ventas) AS num_ventas, SUM(total_bs) AS total_bs,
+                       SUM(total_usd) AS total_usd, SUM(unidades) AS unidades
+                FROM ventas_diarias
+                WHERE 1=1 {filters}
+                GROUP BY 1
+            )
+            SELECT periodos.periodo AS periodos, COALESCE(num_ventas, 0) AS num_ventas,
+                   COALESCE(total_bs, 0.0) AS total_bs, COALESCE(total_usd, 0.0) AS total_usd,
+                   COALESCE(unidades, 0.0) AS unidades
+            FROM periodos LEFT JOIN totales USING (periodo)
+            ORDER BY periodos.periodo
+        """
+        # fetch_columns ya devuelve listas paralelas (y {} si la consulta falla)
+        columns = self.fetch_columns(query, (first_day, last_day, *params))
+        return {key: columns.get(key, []) for key in series}
+
+    def explain(self, query, params=()):
+        """Devuelve el plan de ejecución (EXPLAIN QUERY PLAN) de la consulta como lista de pasos."""
+        rows = self.fetch_all(f"EXPLAIN QUERY PLAN {query}", params)
+        return [row['detail'] for row in rows]
+
+    def full_table_scans(self, query, params=()):
+        """Pasos del plan que recorren una tabla completa ("SCAN tabla" sin usar un índice)."""
+        return [step for step in self.explain(query, params)
+                if step.startswith("SCAN ") and " USING " not in step]
+
+    def check_report_query_plans(self):
+        """Verifica que ninguna consulta de reportes haga un recorrido completo de tabla.
+
+        Devuelve un diccionario {consulta: [pasos problemáticos]}; vacío si todo usa índices.
+        """
+        checks = {
+            "reporte_completo": self._build_sales_report_query(),
+            "reporte_por_fechas": self._build_sales_report_query("2024-01-01", "2024-01-31"),
+            "reporte_por_vendedor": self._build_sales_report_query(seller="Administrador Principal"),
+            "reporte_fechas_y_vendedor": self._build_sales_report_query("2024-01-01", "2024-01-31", "Administrador Principal"),
+            "reporte_pagina_siguiente": self._build_sales_report_query(after=("2024-01-15 10:00:00", 1000), limit=100),
+            "reporte_pagina_vendedor": self._build_sales_report_query(seller="Administrador Principal",
+                                                                      after=("2024-01-15 10:00:00", 1000), limit=100),
+            "detalles_de_venta": ("SELECT * FROM detalles_venta WHERE venta_id = ?", (1,)),
+        }
+        problems = {}
+        for name, (query, params) in checks.items():
+            scans = self.full_table_scans(query, params)
+            if scans:
+                problems[name] = scans
+        return problems
 
     def get_all_sellers(self):
         query = """
@@ -1,6 +1,10 @@
 import customtkinter as ctk
-from tkinter import messagebox, ttk, simpledialog
+from tkinter import messagebox, ttk, simpledialog, filedialog
 import re
+from .tree_grid import VirtualTreeGrid
+from .search_controller import SearchController, product_search_fields
+from .db_manager import DatabaseManager
+from .product_import import import_products
 
 
 ACCENT_CYAN = "#00FFFF"
@@ -37,7 +41,9 @@ class InventoryPage(ctk.CTkFrame):
                                          placeholder_text="Buscar producto por nombre o código...",
                                          width=350, height=40, fg_color="#2c3e50",
                                          border_color=ACCENT_CYAN, border_width=1)
-        self.search_entry.bind("<KeyRelease>", self.search_products)
+        self.search = SearchController(self.search_entry, self.db.search_products,
+                                       self.show_search_results, row_fields=product_search_fields)
+        self.search_entry.bind("<KeyRelease>", self.search.schedule)
         self.search_entry.grid(row=0, column=0, padx=20, pady=10, sticky="w")
 
         self.add_button = ctk.CTkButton(self.search_frame, text="➕ Añadir Producto", command=self.open_add_product_window,
@@ -50,13 +56,18 @@ class InventoryPage(ctk.CTkFrame):
 
         self.delete_button = ctk.CTkButton(self.search_frame, text="🗑️ Eliminar Producto", command=self.delete_selected_product,
                       fg_color=ACCENT_RED, hover_color="#c0392b", height=40)
-        self.delete_button.grid(row=0, column=3, padx=(5,20), pady=10, sticky="e")
+        self.delete_button.grid(row=0, column=3, padx=5, pady=10, sticky="e")
+
+        self.import_button = ctk.CTkButton(self.search_frame, text="📥 Importar Catálogo", command=self.import_catalog,
+                      fg_color="#8e44ad", hover_color="#71368a", height=40)
+        self.import_button.grid(row=0, column=4, padx=(5,20), pady=10, sticky="e")
 
         # Deshabilitar botones si rol no autorizado
         if self.user_role not in ("Administrador Total", "Gerente"):
             self.add_button.configure(state="disabled")
             self.edit_button.configure(state="disabled")
             self.delete_button.configure(state="disabled")
+            self.import_button.configure(state="disabled")
 
         self.table_frame = ctk.CTkFrame(self, fg_color=FRAME_MID, corner_radius=10)
         self.table_frame.grid(row=1, column=0, padx=20, pady=(10,20), sticky="nsew")
@@ -93,78 +104,52 @@ class InventoryPage(ctk.CTkFrame):
         scrollbar = ctk.CTkScrollbar(self.table_frame, command=self.inventory_tree.yview)
         scrollbar.grid(row=0, column=1, sticky="ns", pady=10)
         self.inventory_tree.configure(yscrollcommand=scrollbar.set)
+        self.inventory_tree.tag_configure('min_stock', background=ACCENT_RED, foreground='white')
+        # Listado virtual: solo se materializan las filas visibles, paginadas desde SQLite
+        self.inventory_grid = VirtualTreeGrid(self.inventory_tree, scrollbar,
+                                              fetch_page=self.db.get_products_page,
+                                              key_at=self.db.get_product_key_at,
+                                              count=None,  # el total se cuenta en segundo plano
+                                              format_row=self._format_product_row,
+                                              row_key=lambda product: (product['nombre'], product['id']))
 
         self.load_products()
 
-    def load_products(self, rate=None):
-        for item in self.inventory_tree.get_children():
-            self.inventory_tree.delete(item)
-
-        products = self.db.get_all_products()
-
-        for product in products:
-            stock = product['stock']
-            stock_minimo = product['stock_minimo']
-            tags = ()
-            if stock <= stock_minimo:
-                tags = ('min_stock',)
-            formatted_product = [
-                product['id'],
-                product['codigo'],
-                product['nombre'],
-                f"{stock:g}",
-                f"{stock_minimo:g}",
-                f"$.{product['precio_venta']:,.2f}",
-                f"$.{product['precio_costo']:,.2f}",
-                product['categoria'] if product['categoria'] else 'N/A',
-                product['marca'] if product['marca'] else 'N/A',
-                product['proveedor'] if product['proveedor'] else 'N/A'
-            ]
-
-            self.inventory_tree.insert("", "end", values=formatted_product, tags=tags)
+    def _format_product_row(self, product):
+        stock = product['stock']
+        stock_minimo = product['stock_minimo']
+        tags = ()
+        if stock <= stock_minimo:
+            tags = ('min_stock',)
+        formatted_product = [
+            product['id'],
+            product['codigo'],
+            product['nombre'],
+            f"{stock:g}",
+            f"{stock_minimo:g}",
+            f"$.{product['precio_venta']:,.2f}",
+            f"$.{product['precio_costo']:,.2f}",
+            product['categoria'] if product['categoria'] else 'N/A',
+            product['marca'] if product['marca'] else 'N/A',
+            product['proveedor'] if product['proveedor'] else 'N/A'
+        ]
+        return product['id'], formatted_product, tags
 
-        self.inventory_tree.tag_configure('min_stock', background=ACCENT_RED, foreground='white')
+    def load_products(self, rate=None):
+        self.search.reset()
+        self.inventory_grid.browse()
+        # COUNT(*) recorre todo el índice: se hace en el hilo de consultas
+        self.db.submit(DatabaseManager.count_products, callback=self.inventory_grid.set_total, readonly=True)
 
     def search_products(self, event=None):
-        query = self.search_entry.get().strip()
+        """Busca con el término actual sin esperar el debounce."""
+        self.search.refresh()
 
-        for item in self.inventory_tree.get_children():
-            self.inventory_tree.delete(item)
-
-        if not query:
+    def show_search_results(self, term, products):
+        if not term:
             self.load_products()
             return
-
-        search_term = f"%{query}%"
-        sql_query = """
-            SELECT id, codigo, nombre, stock, stock_minimo, 
-            precio_venta, precio_costo, categoria, marca, proveedor 
-            FROM productos
-            WHERE codigo LIKE ? OR nombre LIKE ? OR marca LIKE ?
-        """
-        products = self.db.fetch_all(sql_query, (search_term, search_term, search_term))
-
-        for product in products:
-            stock = product['stock']
-            stock_minimo = product['stock_minimo']
-            tags = ()
-            if stock <= stock_minimo:
-                tags = ('min_stock',)
-
-            formatted_product = [
-                product['id'],
-                product['codigo'],
-                product['nombre'],
-                f"{stock:g}",
-                f"{stock_minimo:g}",
-                f"$.{product['precio_venta']:,.2f}",
-                f"$.{product['precio_costo']:,.2f}",
-                product['categoria'] if product['categoria'] else 'N/A',
-                product['marca'] if product['marca'] else 'N/A',
-                product['proveedor'] if product['proveedor'] else 'N/A'
-            ]
-
-            self.inventory_tree.insert("", "end", values=formatted_product, tags=tags)
+        self.inventory_grid.show_rows(self._format_product_row(product) for product in products)
 
     def open_add_product_window(self):
         if self.user_role not in ("Administrador Total", "Gerente"):
@@ -362,6 +347,38 @@ class InventoryPage(ctk.CTkFrame):
         else:
             messagebox.showerror("Error DB", "No se pudo actualizar el producto.")
 
+    def import_catalog(self):
+        """Importa un catálogo CSV/XLSX en el hilo de consultas, mostrando el avance en el botón."""
+        if self.user_role not in ("Administrador Total", "Gerente"):
+            messagebox.showwarning("Sin permiso", "No tienes permisos para importar productos.")
+            return
+        path = filedialog.askopenfilename(
+            title="Seleccionar Catálogo de Productos",
+            filetypes=[("Catálogos", "*.csv *.xlsx"), ("CSV", "*.csv"), ("Excel", "*.xlsx")]
+        )
+        if not path:
+            return
+
+        self.import_button.configure(state="disabled", text="📥 Importando...")
+
+        def run_import(db):
+            return import_products(db, path, progress=lambda *counts: db.post_to_ui(self._show_import_progress, *counts))
+
+        self.db.submit(run_import, callback=self._on_import_finished,
+                       error_callback=lambda e: self._on_import_finished((False, f"Error inesperado: {e}")))
+
+    def _show_import_progress(self, processed, imported, failed):
+        self.import_button.configure(text=f"📥 {processed:,} filas...")
+
+    def _on_import_finished(self, result):
+        success, message = result
+        self.import_button.configure(state="normal", text="📥 Importar Catálogo")
+        if success:
+            messagebox.showinfo("Importación Finalizada", message)
+            self.load_products()
+        else:
+            messagebox.showerror("Error de Importación", message)
+
     def delete_selected_product(self):
         if self.user_role not in ("Administrador Total", "Gerente"):
             messagebox.showwarning("Sin permiso", "No tienes permisos para eliminar productos.")
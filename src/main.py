@@ -1,12 +1,17 @@
-import customtkinter as ctk
+from . import startup_timing  # primero, para medir desde el inicio del proceso
+
+with startup_timing.measure("import customtkinter"):
+    import customtkinter as ctk
 from tkinter import messagebox, ttk
 from datetime import datetime
-from PIL import Image
 
 # --- IMPORTACIONES ---
 # Ahora importamos también las funciones de seguridad para usarlas aquí si es necesario
-from .db_manager import DatabaseManager, verify_password, hash_password 
-from .dashboard import DashboardFrame as Dashboard 
+with startup_timing.measure("import db_manager"):
+    from .db_manager import MigrationError, open_database, verify_password, hash_password 
+# Las páginas (y matplotlib) se importan recién al abrirse por primera vez desde el Dashboard
+with startup_timing.measure("import dashboard"):
+    from .dashboard import DashboardFrame as Dashboard 
 # ---------------------
 
 # Definición de colores
@@ -27,7 +32,16 @@ class App(ctk.CTk):
     """Clase principal de la aplicación que maneja el inicio de sesión y la transición al Dashboard."""
     def __init__(self):
         super().__init__()
-        self.db = DatabaseManager() 
+        with startup_timing.measure("DatabaseManager()"):
+            try:
+                self.db = open_database()  # archivo local o servidor de tienda (PROFITUS_SERVER)
+            except MigrationError as e:
+                messagebox.showerror("Error de Base de Datos",
+                                     f"No se pudo actualizar la base de datos y la aplicación no puede continuar.\n\n{e}\n\n"
+                                     "Restaure un backup o contacte a soporte.")
+                super().destroy()
+                raise SystemExit(1)
+        self.db.start_executor(self)  # consultas pesadas fuera del hilo de Tk
         self.title("PROFITUS | Inicializando...")
         self.geometry("1200x700") 
         self.resizable(True, True) 
@@ -40,9 +54,12 @@ class App(ctk.CTk):
         self.current_user_id = None 
         self.current_user_role = None # ¡Nuevo: Almacenaremos el rol!
         
-        self.login_frame = self._create_login_frame(self)
-        self.login_frame.pack(pady=0, padx=0, fill="both", expand=True)
+        with startup_timing.measure("pantalla de inicio de sesión"):
+            self.login_frame = self._create_login_frame(self)
+            self.login_frame.pack(pady=0, padx=0, fill="both", expand=True)
         self.after(100, lambda: self.title("PROFITUS | Iniciar Sesión"))
+        # after_idle corre cuando la ventana ya se dibujó por primera vez
+        self.after_idle(startup_timing.report)
 
 
     def _create_login_frame(self, master):
@@ -58,12 +75,12 @@ class App(ctk.CTk):
         login_container.grid_columnconfigure(0, weight=1)
         
         try:
-             # Carga del logo
-             logo_img = ctk.CTkImage(light_image=Image.open(LOGO_PATH),
-                                     dark_image=Image.open(LOGO_PATH),
-                                     size=(150, 150)) 
+             # Carga del logo (PIL se importa solo aquí)
+             from PIL import Image
+             logo = Image.open(LOGO_PATH)
+             logo_img = ctk.CTkImage(light_image=logo, dark_image=logo, size=(150, 150)) 
              ctk.CTkLabel(login_container, image=logo_img, text="").grid(row=1, column=0, pady=(40, 5))
-        except FileNotFoundError:
+        except (FileNotFoundError, ImportError):
              ctk.CTkLabel(login_container, text="[Logo no encontrado]", text_color="red").grid(row=1, column=0, pady=(40, 5))
 
         ctk.CTkLabel(login_container, text="PROFITUS - ERP Lite", 
@@ -121,8 +138,10 @@ class App(ctk.CTk):
         self.title("PROFITUS | ERP Lite para PYMES")
         
         # Pasamos el rol del usuario al Dashboard
-        dashboard_frame = Dashboard(self, self.db, self.current_user_id, user_role) 
-        dashboard_frame.pack(expand=True, fill="both")
+        with startup_timing.measure("Dashboard"):
+            dashboard_frame = Dashboard(self, self.db, self.current_user_id, user_role) 
+            dashboard_frame.pack(expand=True, fill="both")
+        self.after_idle(lambda: startup_timing.report("Dashboard", since_start=False))
         
     def destroy(self):
         """Cierra la conexión a la base de datos al cerrar la aplicación."""
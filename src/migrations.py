@@ -0,0 +1,269 @@
+"""
+Migraciones del esquema de la base de datos.
+
+La versión del esquema se guarda en `PRAGMA user_version` (cabecera del archivo),
+así que al arrancar basta una lectura para saber si falta algo: con la base al día
+no se ejecuta ningún DDL. Cada migración corre en su propia transacción junto con
+el cambio de `user_version`; si falla, se deshace completa y la base queda en la
+versión anterior.
+
+Para cambiar el esquema se agrega una función al final de MIGRATIONS; nunca se
+modifican las ya publicadas. La migración 1 toma las bases creadas antes de este
+sistema (user_version = 0), que pueden tener cualquier subconjunto de columnas,
+y por eso todas las migraciones usan IF NOT EXISTS o recrean lo que tocan.
+
+Si una migración falla, `migrate` lanza MigrationError: la aplicación no debe
+seguir con un esquema a medias (faltarían tablas como ventas_diarias).
+"""
+from sqlite3 import Error
+
+# Columnas agregadas a mano a lo largo del tiempo; las bases antiguas pueden no tenerlas
+LEGACY_COLUMNS = [
+    ('productos', 'proveedor', 'TEXT'),
+    ('productos', 'stock_minimo', 'REAL NOT NULL DEFAULT 0'),
+    ('productos', 'marca', 'TEXT'),
+    ('productos', 'categoria', 'TEXT'),
+    ('usuarios', 'foto_path', 'TEXT'),
+    ('usuarios', 'nombre_completo', 'TEXT'),
+    ('detalles_venta', 'precio_unitario_bs', 'REAL NOT NULL DEFAULT 0.0'),
+    ('detalles_venta', 'subtotal_bs', 'REAL NOT NULL DEFAULT 0.0'),
+    ('detalles_venta', 'precio_unitario_usd', 'REAL NOT NULL DEFAULT 0.0'),
+    ('detalles_venta', 'subtotal_usd', 'REAL NOT NULL DEFAULT 0.0'),
+    ('ventas', 'user_id', 'INTEGER'),
+    ('ventas', 'payment_method', "TEXT DEFAULT 'Efectivo'"),
+    ('ventas', 'amount_received', "REAL DEFAULT 0.0"),
+    ('ventas', 'change_given', "REAL DEFAULT 0.0"),
+    ('ventas', 'mobile_payment_id', "TEXT DEFAULT NULL"),
+]
+
+FTS_COLUMNS = "codigo, nombre, marca, categoria, proveedor"
+
+
+class MigrationError(Error):
+    """No se pudo llevar el esquema a la versión actual; la base quedó en la última versión completa."""
+
+
+def get_schema_version(db):
+    return db.conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def _recreate_index(db, name, table, columns):
+    db.execute_query(f"DROP INDEX IF EXISTS {name}")
+    db.execute_query(f"CREATE INDEX {name} ON {table}({columns})")
+
+
+def _recreate_trigger(db, name, sql):
+    db.execute_query(f"DROP TRIGGER IF EXISTS {name}")
+    db.execute_query(sql)
+
+
+def _base_tables(db):
+    """Tablas principales, más las columnas que les falten a las bases antiguas."""
+    db.execute_query("""
+        CREATE TABLE IF NOT EXISTS usuarios (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL UNIQUE,
+            password TEXT NOT NULL,
+            nombre_completo TEXT,
+            rol TEXT NOT NULL DEFAULT 'Cajero',
+            foto_path TEXT
+        )
+    """)
+    db.execute_query("""
+        CREATE TABLE IF NOT EXISTS productos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            codigo TEXT NOT NULL UNIQUE,
+            nombre TEXT NOT NULL,
+            stock REAL NOT NULL DEFAULT 0,
+            precio_venta REAL NOT NULL,
+            precio_costo REAL NOT NULL,
+            categoria TEXT,
+            proveedor TEXT,
+            stock_minimo REAL NOT NULL DEFAULT 0,
+            marca TEXT
+        )
+    """)
+    db.execute_query("""
+        CREATE TABLE IF NOT EXISTS configuracion (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )
+    """)
+    db.execute_query("""
+        CREATE TABLE IF NOT EXISTS ventas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            fecha TEXT NOT NULL,
+            total_bs REAL NOT NULL,
+            total_usd REAL NOT NULL,
+            tasa_cambio REAL NOT NULL,
+            user_id INTEGER,
+            payment_method TEXT DEFAULT 'Efectivo',
+            amount_received REAL DEFAULT 0.0,
+            change_given REAL DEFAULT 0.0,
+            mobile_payment_id TEXT DEFAULT NULL,
+            FOREIGN KEY (user_id) REFERENCES usuarios(id)
+        )
+    """)
+    db.execute_query("""
+        CREATE TABLE IF NOT EXISTS detalles_venta (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            venta_id INTEGER NOT NULL,
+            producto_id INTEGER NOT NULL,
+            nombre_producto TEXT NOT NULL,
+            cantidad REAL NOT NULL,
+            precio_unitario_usd REAL NOT NULL,
+            precio_unitario_bs REAL NOT NULL,
+            subtotal_usd REAL NOT NULL,
+            subtotal_bs REAL NOT NULL,
+            FOREIGN KEY (venta_id) REFERENCES ventas(id),
+            FOREIGN KEY (producto_id) REFERENCES productos(id)
+        )
+    """)
+
+    existing = {}
+    for table, column, column_type in LEGACY_COLUMNS:
+        if table not in existing:
+            existing[table] = {row[1] for row in db.conn.execute(f"PRAGMA table_info({table})")}
+        if column not in existing[table]:
+            db.execute_query(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+            existing[table].add(column)
+            print(f"Columna '{column}' añadida a la tabla '{table}'.")
+
+
+def _catalog_change_log(db):
+    """Registro de cambios del catálogo: una fila por producto con la versión de su último cambio."""
+    db.execute_query("""
+        CREATE TABLE IF NOT EXISTS productos_cambios (
+            producto_id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+    """)
+    db.execute_query("CREATE INDEX IF NOT EXISTS idx_productos_cambios_version ON productos_cambios(version)")
+
+    # Cada INSERT/UPDATE/DELETE sobre productos marca la fila como sucia con una versión nueva.
+    # Se usa ON CONFLICT DO UPDATE y no INSERT OR REPLACE: dentro de un trigger, el OR REPLACE
+    # queda anulado por la política de la sentencia externa (p. ej. el upsert de la importación).
+    for event, row_ref in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+        name = f"trg_productos_cambios_{event.lower()}"
+        _recreate_trigger(db, name, f"""
+            CREATE TRIGGER {name}
+            AFTER {event} ON productos
+            BEGIN
+                INSERT INTO productos_cambios (producto_id, version)
+                VALUES ({row_ref}.id, (SELECT COALESCE(MAX(version), 0) + 1 FROM productos_cambios))
+                ON CONFLICT(producto_id) DO UPDATE SET version = excluded.version;
+            END
+        """)
+
+
+def _query_indexes(db):
+    """Índices de los reportes de ventas (ver check_report_query_plans) y de los listados de productos."""
+    # Cubren las columnas del reporte de ventas, por fecha y por vendedor. `id` va justo después
+    # de `fecha` para que el orden (fecha, id) de la paginación salga del índice sin ordenar
+    _recreate_index(db, "idx_ventas_fecha", "ventas", "fecha, id, user_id, total_bs, total_usd")
+    _recreate_index(db, "idx_ventas_user_fecha", "ventas", "user_id, fecha, id, total_bs, total_usd")
+    db.execute_query("CREATE INDEX IF NOT EXISTS idx_detalles_venta_venta ON detalles_venta(venta_id)")
+    db.execute_query("CREATE INDEX IF NOT EXISTS idx_usuarios_nombre ON usuarios(nombre_completo)")
+    # Paginación por clave (nombre COLLATE NOCASE, id) de los listados virtuales
+    db.execute_query("CREATE INDEX IF NOT EXISTS idx_productos_nombre_nocase ON productos(nombre COLLATE NOCASE, id)")
+
+
+def _daily_sales_rollup(db):
+    """Resumen de ventas por día × vendedor × método de pago, para gráficos y totales sin recorrer `ventas`.
+
+    Se mantiene en process_sale_transaction y en la edición de líneas de venta;
+    `rebuild_daily_sales()` lo recalcula desde cero.
+    """
+    db.execute_query("""
+        CREATE TABLE IF NOT EXISTS ventas_diarias (
+            dia TEXT NOT NULL,
+            user_id INTEGER NOT NULL,
+            payment_method TEXT NOT NULL,
+            num_ventas INTEGER NOT NULL DEFAULT 0,
+            total_bs REAL NOT NULL DEFAULT 0,
+            total_usd REAL NOT NULL DEFAULT 0,
+            unidades REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (dia, user_id, payment_method)
+        ) WITHOUT ROWID
+    """)
+    db.rebuild_daily_sales()
+
+
+def _product_search_index(db):
+    """Índice FTS5 sobre productos, sincronizado por triggers. Si FTS5 no está disponible se usa LIKE."""
+    try:
+        db.execute_query(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS productos_fts USING fts5(
+                {FTS_COLUMNS},
+                content='productos', content_rowid='id',
+                tokenize="unicode61 remove_diacritics 2 tokenchars '-_./'"
+            )
+        """)
+    except Error as e:
+        print(f"Advertencia: FTS5 no disponible ({e}), la búsqueda de productos usará LIKE.")
+        return
+
+    new_values = "NEW.codigo, NEW.nombre, NEW.marca, NEW.categoria, NEW.proveedor"
+    old_values = "OLD.codigo, OLD.nombre, OLD.marca, OLD.categoria, OLD.proveedor"
+    _recreate_trigger(db, "trg_productos_fts_insert", f"""
+        CREATE TRIGGER trg_productos_fts_insert AFTER INSERT ON productos BEGIN
+            INSERT INTO productos_fts (rowid, {FTS_COLUMNS}) VALUES (NEW.id, {new_values});
+        END
+    """)
+    _recreate_trigger(db, "trg_productos_fts_delete", f"""
+        CREATE TRIGGER trg_productos_fts_delete AFTER DELETE ON productos BEGIN
+            INSERT INTO productos_fts (productos_fts, rowid, {FTS_COLUMNS}) VALUES ('delete', OLD.id, {old_values});
+        END
+    """)
+    # Solo al cambiar columnas indexadas: las ventas y los cambios de precio no reindexan
+    _recreate_trigger(db, "trg_productos_fts_update", f"""
+        CREATE TRIGGER trg_productos_fts_update AFTER UPDATE OF {FTS_COLUMNS} ON productos BEGIN
+            INSERT INTO productos_fts (productos_fts, rowid, {FTS_COLUMNS}) VALUES ('delete', OLD.id, {old_values});
+            INSERT INTO productos_fts (rowid, {FTS_COLUMNS}) VALUES (NEW.id, {new_values});
+        END
+    """)
+    db.execute_query("INSERT INTO productos_fts (productos_fts) VALUES ('rebuild')")
+
+
+# La posición en la lista es la versión: MIGRATIONS[0] lleva la base a user_version = 1, etc.
+MIGRATIONS = [
+    _base_tables,
+    _catalog_change_log,
+    _query_indexes,
+    _daily_sales_rollup,
+    _product_search_index,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+SEARCH_INDEX_VERSION = MIGRATIONS.index(_product_search_index) + 1
+
+
+def _has_table(db, name):
+    return db.conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone() is not None
+
+
+def migrate(db):
+    """Aplica las migraciones pendientes y devuelve la versión en la que quedó la base.
+
+    Lanza MigrationError si alguna falla (esa migración se deshace completa).
+    """
+    start_version = version = get_schema_version(db)
+    if version > SCHEMA_VERSION:
+        print(f"Advertencia: la base tiene el esquema v{version}, más nuevo que el de esta versión (v{SCHEMA_VERSION}).")
+
+    for target, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        try:
+            with db.transaction(immediate=True):
+                migration(db)
+                db.conn.execute(f"PRAGMA user_version = {target}")
+        except Error as e:
+            print(f"Error al migrar el esquema a la versión {target} ({migration.__name__}): {e}")
+            raise MigrationError(f"No se pudo actualizar el esquema a la versión {target} ({migration.__name__}): {e}") from e
+        version = target
+        print(f"Esquema de la base actualizado a la versión {target}.")
+
+    # La migración del índice de búsqueda se da por aplicada aunque el SQLite de ese momento no
+    # trajera FTS5 (se usa LIKE); se reintenta al arrancar por si ahora sí está disponible
+    if start_version >= SEARCH_INDEX_VERSION and not _has_table(db, "productos_fts"):
+        with db.transaction(immediate=True):
+            _product_search_index(db)
+    return version
@@ -1,6 +1,10 @@
 import customtkinter as ctk
 from tkinter import messagebox, ttk, simpledialog, Menu
 import math
+from .tree_grid import TreeGrid, VirtualTreeGrid
+from .search_controller import SearchController
+from .product_catalog import ProductCatalog, product_fields
+from .cart import Cart
 
 # Definición de colores
 ACCENT_CYAN = "#00FFFF"
@@ -16,8 +20,12 @@ class PosPage(ctk.CTkFrame):
         self.db = db_manager
         self.user_id = user_id
         
-        self.cart = {}
-        self.current_exchange_rate = 36.00
+        self.current_exchange_rate = self.db.get_exchange_rate() or 36.00
+        # Totales incrementales: la vista solo repinta la línea que cambió (ver _on_cart_change)
+        self.cart = Cart(self.current_exchange_rate, on_change=self._on_cart_change)
+        # Búsqueda, escáner y stock trabajan sobre el catálogo en memoria; refresh_products lo sincroniza.
+        # Se arma en segundo plano: hasta que esté listo las consultas van a la base
+        self.catalog = ProductCatalog(self.db, on_reload=self.on_catalog_reload)
         
         # Variables para método de pago y monto recibido
         self.payment_method_var = ctk.StringVar(value="Seleccione método de pago")
@@ -58,7 +66,12 @@ class PosPage(ctk.CTkFrame):
                                          placeholder_text="Escriba código o nombre...", 
                                          width=350, height=40, 
                                          fg_color="#2c3e50", border_color=ACCENT_CYAN, border_width=1)
-        self.search_entry.bind("<KeyRelease>", self.search_products)
+        self.search = SearchController(self.search_entry, self._fetch_search_results,
+                                       self.show_search_results, row_fields=product_fields)
+        self.search_entry.bind("<KeyRelease>", self.on_search_key)
+        # Los lectores de código de barras terminan cada lectura con Enter
+        self.search_entry.bind("<Return>", self.scan_product)
+        self.search_entry.bind("<KP_Enter>", self.scan_product)
         self.search_entry.grid(row=1, column=0, padx=20, pady=(0, 10), sticky="ew")
 
         self.search_results_frame = ctk.CTkFrame(self.left_panel, fg_color=FRAME_DARK, corner_radius=10)
@@ -68,20 +81,26 @@ class PosPage(ctk.CTkFrame):
 
         self.product_tree.destroy()
         self.product_tree = ttk.Treeview(self.search_results_frame, 
-                                        columns=("code", "name", "price_bs", "stock_disp", "price_usd_stock"), 
+                                        columns=("code", "name", "price_bs", "stock_disp"), 
                                         show='headings', 
                                         style="Cart.Treeview")
         self.product_tree.heading("code", text="Código"); self.product_tree.column("code", width=80, stretch=ctk.NO)
         self.product_tree.heading("name", text="Producto"); self.product_tree.column("name", minwidth=150, stretch=ctk.YES)
         self.product_tree.heading("price_bs", text="Precio (Bs)"); self.product_tree.column("price_bs", width=90, anchor=ctk.E)
         self.product_tree.heading("stock_disp", text="Stock Disp."); self.product_tree.column("stock_disp", width=80, anchor=ctk.CENTER)
-        self.product_tree.heading("price_usd_stock", text=""); self.product_tree.column("price_usd_stock", width=0, stretch=ctk.NO)
         self.product_tree.grid(row=0, column=0, sticky="nsew", padx=10, pady=10)
         self.product_tree.bind("<Double-1>", self.add_to_cart_event)
         
         product_scrollbar = ctk.CTkScrollbar(self.search_results_frame, command=self.product_tree.yview)
         product_scrollbar.grid(row=0, column=1, sticky="ns", pady=10)
         self.product_tree.configure(yscrollcommand=product_scrollbar.set)
+        # Sin término de búsqueda el catálogo se muestra en modo virtual (solo filas visibles)
+        self.product_grid = VirtualTreeGrid(self.product_tree, product_scrollbar,
+                                            fetch_page=self.catalog.page,
+                                            key_at=self.catalog.key_at,
+                                            count=self.catalog.count,
+                                            format_row=self._format_product,
+                                            row_key=self.catalog.row_key)
 
         # Derecha: carrito y resumen
         self.right_panel = ctk.CTkFrame(self, fg_color=FRAME_MID, corner_radius=10)
@@ -114,6 +133,7 @@ class PosPage(ctk.CTkFrame):
         self.cart_tree.column("subtotal_bs", width=110, anchor=ctk.E)
         self.cart_tree.grid(row=0, column=0, sticky="nsew", padx=10, pady=10)
         self.cart_tree.bind("<Button-3>", self.show_cart_context_menu)
+        self.cart_grid = TreeGrid(self.cart_tree)
         
         cart_scrollbar = ctk.CTkScrollbar(self.cart_frame, command=self.cart_tree.yview)
         cart_scrollbar.grid(row=0, column=1, sticky="ns", pady=10)
@@ -172,21 +192,53 @@ class PosPage(ctk.CTkFrame):
                       font=ctk.CTkFont(size=18, weight="bold")).grid(row=2, column=1, rowspan=4, padx=20, pady=10, sticky="nsew")
 
         self.load_all_products_for_search()
+        self.catalog.load_async()
         self.refresh_products()
+        self.db.subscribe_config("exchange_rate", self.update_rate)
 
     # Aquí siguen todos los métodos previos tal cual los tienes (search_products, add_to_cart_event, etc.)
     # Sin cambios.
 
     def refresh_products(self):
         if str(self.winfo_viewable()) == '1':
-            self.load_all_products_for_search()
+            self.apply_catalog_changes()
         self.after(2000, self.refresh_products)
 
+    def apply_catalog_changes(self):
+        """Trae al catálogo en memoria los productos que cambiaron y repinta el listado si hubo cambios."""
+        if not self.catalog.sync():
+            return
+        self.search.reset()  # los resultados guardados ya no reflejan el catálogo
+        self.search_products()
+
+    def on_catalog_reload(self):
+        """El catálogo terminó de cargarse en segundo plano: el listado pasa a leer de memoria."""
+        self.search.reset()
+        self.search_products()
+
+    def _format_product(self, product):
+        values, row_tags = self._product_row(product)
+        return f"id_{product.id}", values, row_tags
+
+    def _available_stock(self, product):
+        return int(product.stock) - self.cart.quantity(product.id)
+
+    def _product_row(self, product):
+        price_bs = product.precio_venta * self.current_exchange_rate
+        stock_disponible = self._available_stock(product)
+
+        row_tags = ()
+        if stock_disponible <= 0:
+            row_tags = ('out_of_stock',)
+
+        return (product.codigo, product.nombre, f"{price_bs:,.2f}", stock_disponible), row_tags
+
     def update_rate(self, new_rate):
         if new_rate is not None and isinstance(new_rate, (int, float)):
             self.current_exchange_rate = new_rate
             self.rate_label.configure(text=f"Tasa Venta: Bs/ {self.current_exchange_rate:,.2f}")
-            self.update_cart_display()
+            self.search_products()  # los precios en Bs del listado dependen de la tasa
+            self.cart.set_rate(new_rate)
             self.update_change_display()
         else:
             print("Advertencia: Tasa de cambio inválida recibida.")
@@ -194,74 +246,75 @@ class PosPage(ctk.CTkFrame):
     def load_all_products_for_search(self):
         self.search_products()
 
-    def search_products(self, event=None):
-        query = self.search_entry.get().strip()
-        for item in self.product_tree.get_children():
-            self.product_tree.delete(item)
-
-        sql_query = """
-            SELECT id, codigo, nombre, precio_venta, stock 
-            FROM productos 
-            WHERE codigo LIKE ? OR nombre LIKE ?
-            ORDER BY nombre
-        """
-        search_term = f"%{query}%"
-        products = self.db.fetch_all(sql_query, (search_term, search_term))
+    def on_search_key(self, event):
+        if event.keysym in ("Return", "KP_Enter"):
+            return  # Enter lo maneja scan_product
+        self.search.schedule()
 
-        for prod in products:
-            id_prod, code, name, price_usd, stock_real = prod
-            price_bs = price_usd * self.current_exchange_rate
-            stock_en_carrito = self.cart.get(id_prod, {}).get('cantidad', 0)
-            stock_disponible = int(stock_real) - stock_en_carrito
+    def search_products(self, event=None):
+        """Vuelve a pintar el listado con el término actual, sin esperar el debounce."""
+        self.search.refresh()
 
-            row_tags = ()
-            if stock_disponible <= 0:
-                row_tags = ('out_of_stock',)
+    def _fetch_search_results(self, term):
+        return self.catalog.search(term)
 
-            data_oculta = f"{price_usd:.2f},{stock_real}"
-            self.product_tree.insert("", "end", 
-                                    iid=f"id_{id_prod}", 
-                                    values=(code, name, f"{price_bs:,.2f}", stock_disponible, data_oculta),
-                                    tags=row_tags)
+    def show_search_results(self, term, products):
+        if not term:
+            self.product_grid.browse()
+            return
+        self.product_grid.show_rows(self._format_product(prod) for prod in products)
 
     def add_to_cart_event(self, event):
         selected_item = self.product_tree.focus()
         if not selected_item:
             return
 
-        values = self.product_tree.item(selected_item, 'values')
-        try:
-            stock_disponible_en_vista = int(values[3])
-            data_oculta_str = values[4]
-            price_usd = float(data_oculta_str.split(',')[0])
-            stock_real = float(data_oculta_str.split(',')[1])
-        except (ValueError, IndexError) as e:
-            print(f"Error al leer datos del producto: {e}")
-            messagebox.showerror("Error", "Error al leer los datos internos del producto.")
+        product = self.catalog.get(int(selected_item.split('_')[1]))
+        if product is None:
+            messagebox.showerror("Error", "El producto ya no existe en el catálogo.")
             return
 
-        if stock_disponible_en_vista <= 0:
+        if self._available_stock(product) <= 0:
             messagebox.showwarning("Stock", "Stock insuficiente para añadir este producto.")
             return
 
-        product_id = int(selected_item.split('_')[1])
-        name = values[1]
-
-        if product_id in self.cart:
-            self.cart[product_id]['cantidad'] += 1
-        else:
-            price_bs = price_usd * self.current_exchange_rate
-            self.cart[product_id] = {
-                'nombre': name,
-                'precio_usd': price_usd,
-                'precio_bs': price_bs,
-                'stock_real': stock_real,
-                'cantidad': 1,
-            }
-
-        self.update_cart_display()
+        self._add_to_cart(product)
         self.search_products()
 
+    def scan_product(self, event=None):
+        """Modo escáner: si el texto es un código completo, añade el producto directo al carrito.
+
+        Usa el índice por código del catálogo en memoria y no reconstruye el
+        listado de productos; solo se actualiza la fila del producto si está visible.
+        Si el texto no es un código, se hace la búsqueda normal.
+        """
+        self.search.cancel()
+        code = self.search_entry.get().strip()
+        if not code:
+            return "break"
+
+        product = self.catalog.get_by_code(code) or self.catalog.get_by_code(code.upper())
+        if product is None:
+            self.search_products()
+            return "break"
+
+        if product.stock - self.cart.quantity(product.id) < 1:
+            messagebox.showwarning("Stock", f"Stock insuficiente para '{product.nombre}'.")
+            return "break"
+
+        self._add_to_cart(product)
+        self.search_entry.delete(0, 'end')
+        if self.search.last_term:
+            self.search.run_now()  # se llegó a buscar parte del código: volver al listado completo
+
+        iid, values, row_tags = self._format_product(product)
+        if iid in self.product_grid:
+            self.product_grid.upsert(iid, values, row_tags)
+        return "break"
+
+    def _add_to_cart(self, product):
+        self.cart.add(product.id, product.nombre, product.precio_venta, product.stock)
+
     def show_cart_context_menu(self, event):
         selected_item = self.cart_tree.identify_row(event.y)
         if not selected_item:
@@ -283,18 +336,17 @@ class PosPage(ctk.CTkFrame):
             menu.grab_release()
 
     def get_real_stock(self, product_id):
-        if product_id in self.cart:
-            return self.cart[product_id]['stock_real']
-        else:
-            stock_data = self.db.fetch_one("SELECT stock FROM productos WHERE id = ?", (product_id,))
-            return float(stock_data[0]) if stock_data and stock_data[0] is not None else 0.0
+        """Stock actual según el catálogo en memoria; también refresca el que guarda el carrito."""
+        stock = self.catalog.stock(product_id)
+        self.cart.set_stock(product_id, stock)
+        return stock
 
     def adjust_cart_quantity(self, product_id, adjustment):
         if product_id not in self.cart:
             return
         
-        new_qty = self.cart[product_id]['cantidad'] + adjustment
-        real_stock = self.cart[product_id]['stock_real']
+        new_qty = self.cart.quantity(product_id) + adjustment
+        real_stock = self.get_real_stock(product_id)
 
         if new_qty <= 0:
             self.remove_from_cart(product_id)
@@ -304,21 +356,17 @@ class PosPage(ctk.CTkFrame):
             messagebox.showwarning("Stock", f"No puedes añadir más. El stock máximo real disponible es {math.floor(real_stock)}.")
             return
 
-        self.cart[product_id]['cantidad'] = new_qty
-        price_usd = self.cart[product_id]['precio_usd']
-        self.cart[product_id]['precio_bs'] = price_usd * self.current_exchange_rate
-
-        self.update_cart_display()
+        self.cart.set_quantity(product_id, new_qty)
         self.search_products()
 
     def prompt_for_quantity(self, product_id):
         if product_id not in self.cart:
             return
 
-        current_qty = self.cart[product_id]['cantidad']
-        real_stock = self.cart[product_id]['stock_real']
+        current_qty = self.cart.quantity(product_id)
+        real_stock = self.get_real_stock(product_id)
 
-        new_qty_str = simpledialog.askstring("Cambiar Cantidad", f"Ingrese la nueva cantidad para '{self.cart[product_id]['nombre']}'.\nStock Real: {math.floor(real_stock)}", initialvalue=str(current_qty), parent=self)
+        new_qty_str = simpledialog.askstring("Cambiar Cantidad", f"Ingrese la nueva cantidad para '{self.cart.get(product_id)['nombre']}'.\nStock Real: {math.floor(real_stock)}", initialvalue=str(current_qty), parent=self)
         if new_qty_str is None:
             return
         
@@ -334,11 +382,7 @@ class PosPage(ctk.CTkFrame):
                 messagebox.showwarning("Stock", f"Cantidad inválida. El stock real es {real_stock:.2f}.")
                 return
 
-            self.cart[product_id]['cantidad'] = new_qty_rounded
-            price_usd = self.cart[product_id]['precio_usd']
-            self.cart[product_id]['precio_bs'] = price_usd * self.current_exchange_rate
-
-            self.update_cart_display()
+            self.cart.set_quantity(product_id, new_qty_rounded)
             self.search_products()
 
         except ValueError:
@@ -347,40 +391,43 @@ class PosPage(ctk.CTkFrame):
 
     def remove_from_cart(self, product_id):
         if product_id in self.cart:
-            del self.cart[product_id]
-            self.update_cart_display()
+            self.cart.remove(product_id)
             self.search_products()
 
+    def _cart_row(self, product_id, line):
+        cantidad = line['cantidad']
+        return (f"cart_item_{product_id}",
+                (
+                    product_id,
+                    line['nombre'],
+                    f"{cantidad:,.2f}",
+                    f"{line['precio_usd']:,.2f}",
+                    f"{line['precio_bs']:,.2f}",
+                    f"{cantidad * line['precio_bs']:,.2f}"
+                ),
+                ())
+
+    def _on_cart_change(self, event, product_id, line):
+        """Listener del carrito: aplica al árbol solo la línea que cambió y actualiza los totales."""
+        if event == "line":
+            self.cart_grid.upsert(*self._cart_row(product_id, line))
+        elif event == "remove":
+            self.cart_grid.remove(f"cart_item_{product_id}")
+        else:
+            self.update_cart_display()
+            return
+        self.update_totals_display()
+
     def update_cart_display(self):
-        for item in self.cart_tree.get_children():
-            self.cart_tree.delete(item)
-
-        total_general_bs = 0.0
-
-        for p_id, data in self.cart.items():
-            cantidad = data['cantidad']
-            precio_usd = data['precio_usd']
-            precio_bs = precio_usd * self.current_exchange_rate
-            subtotal_bs = cantidad * precio_bs
-            data['precio_bs'] = precio_bs
-            total_general_bs += subtotal_bs
-
-            self.cart_tree.insert("", "end",
-                                  iid=f"cart_item_{p_id}",
-                                  values=(
-                                        p_id,
-                                        data['nombre'],
-                                        f"{cantidad:,.2f}",
-                                        f"{precio_usd:,.2f}",
-                                        f"{precio_bs:,.2f}",
-                                        f"{subtotal_bs:,.2f}"
-                                  ))
+        """Repinta todas las líneas del carrito (tras un cambio de tasa o al vaciarlo)."""
+        self.cart_grid.set_rows(self._cart_row(p_id, line) for p_id, line in self.cart.items())
+        self.update_totals_display()
 
+    def update_totals_display(self):
         if self.current_exchange_rate > 0:
-            total_general_usd = total_general_bs / self.current_exchange_rate
-            self.total_label.configure(text=f"TOTAL: ${total_general_usd:,.2f} / Bs/ {total_general_bs:,.2f}")
+            self.total_label.configure(text=f"TOTAL: ${self.cart.total_usd:,.2f} / Bs/ {self.cart.total_bs:,.2f}")
         else:
-            self.total_label.configure(text=f"TOTAL: Bs/ {total_general_bs:,.2f}")
+            self.total_label.configure(text=f"TOTAL: Bs/ {self.cart.total_bs:,.2f}")
 
     def on_payment_method_change(self, method):
         if method == "Efectivo":
@@ -396,15 +443,7 @@ class PosPage(ctk.CTkFrame):
 
     def update_change_display(self, event=None):
         try:
-            total_label_text = self.total_label.cget("text")
-            if "TOTAL: $" in total_label_text:
-                parts = total_label_text.split("TOTAL: $")[1].split("/")
-                total_usd_str = parts[0].strip().replace(",", "")
-                total_usd = float(total_usd_str)
-            else:
-                bs_part = total_label_text.split('Bs/')[-1].strip().replace(",", "")
-                total_bs = float(bs_part)
-                total_usd = total_bs / self.current_exchange_rate
+            total_usd = self.cart.total_usd
 
             method = self.payment_method_var.get()
             amount_received_str = self.amount_received_var.get().replace(',', '.').strip()
@@ -451,16 +490,9 @@ class PosPage(ctk.CTkFrame):
             messagebox.showerror("Monto Recibido", "Por favor, ingrese un monto recibido válido.")
             return
 
-        total_label_text = self.total_label.cget("text")
-        if "TOTAL: $" in total_label_text:
-            parts = total_label_text.split("TOTAL: $")[1].split("/")
-            total_final_usd_str = parts[0].strip().replace(",", "")
-            total_final_usd = float(total_final_usd_str)
-        else:
-            bs_part = total_label_text.split('Bs/')[-1].strip().replace(",", "")
-            total_final_bs = float(bs_part)
-            total_final_usd = total_final_bs / self.current_exchange_rate
-        
+        # Redondeado al centavo, como el total que ve el cajero
+        total_final_usd = round(self.cart.total_usd, 2)
+
         if method == "Efectivo":
             currency = self.cash_currency_var.get()
             if "Dólares" in currency:
@@ -499,7 +531,7 @@ class PosPage(ctk.CTkFrame):
                 mobile_payment_id=mobile_payment_id
             )
             if success:
-                summary = f"Venta procesada con éxito!\n\nProductos: {len(self.cart)} artículos únicos.\nTotal Final: ${total_final_usd:,.2f} / Bs/ {total_final_usd * self.current_exchange_rate:,.2f}"
+                summary = f"Venta procesada con éxito!\n\nProductos: {self.cart.line_count} artículos únicos ({self.cart.item_count:g} unidades).\nTotal Final: ${total_final_usd:,.2f} / Bs/ {total_final_usd * self.current_exchange_rate:,.2f}"
                 if method == "Efectivo":
                     summary += f"\nMonto Recibido: {amount_received:.2f} {'USD' if 'Dólares' in self.cash_currency_var.get() else 'Bs'}"
                     summary += f"\nCambio: {change:.2f} {'USD' if 'Dólares' in self.cash_currency_var.get() else 'Bs'}"
@@ -507,8 +539,9 @@ class PosPage(ctk.CTkFrame):
                     summary += f"\nID Pago Móvil: {mobile_payment_id}"
                 messagebox.showinfo("Venta Exitosa", summary)
 
-                self.cart = {}
-                self.update_cart_display()
+                self.cart.clear()
+                self.catalog.sync()  # el stock cambió en la base de datos
+                self.search.reset()
                 self.search_products()
                 self.amount_received_var.set("0.00")
                 self.mobile_payment_id_var.set("")
@@ -518,6 +551,7 @@ class PosPage(ctk.CTkFrame):
                 self.update_change_display()
             else:
                 messagebox.showerror("Error de Venta", f"No se pudo procesar la venta. Razón: {message}")
+                self.apply_catalog_changes()  # mostrar el stock real que hizo fallar la venta
         except Exception as e:
             messagebox.showerror("Error Inesperado", f"Ocurrió un error al procesar la venta: {e}")
 
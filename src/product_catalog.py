@@ -0,0 +1,282 @@
+"""
+Catálogo de productos en memoria para el punto de venta.
+
+El POS busca, escanea y consulta stock sin ir a SQLite en cada tecla o clic:
+
+- Cada producto es un `Product` con __slots__ (sin __dict__ por instancia), así
+  que la memoria por SKU queda acotada a sus campos.
+- Índices hash por `id` y por `codigo` para el carrito y el escáner.
+- Un índice ordenado por nombre (claves `(nombre normalizado, id)`) para el
+  listado virtual, paginado con bisect.
+- Un índice de palabras: lista ordenada de palabras distintas + conjunto de ids
+  por palabra. Una búsqueda por prefijo es un bisect sobre la lista ordenada y
+  reproduce la semántica de `DatabaseManager.search_products`.
+
+`sync()` se mantiene al día con la base usando la versión del registro de
+cambios (`get_catalog_version` / `get_product_changes`): solo se releen los
+productos modificados.
+
+Con miles de SKU armar los índices lleva su tiempo, así que `load_async()` los
+construye en el pool de lectura (`db.submit(..., readonly=True)`) y los cambia
+de una vez en el hilo de Tk. Mientras no estén listos (`ready` en False) las
+consultas van directo a la base, con la misma interfaz; la clave del listado
+la da `row_key()`, que corresponde a la fuente que se está usando.
+"""
+import heapq
+from bisect import bisect_left, bisect_right, insort
+
+from .db_manager import SEARCH_LIMIT, gc_paused
+from .utils import normalize_search_text, search_tokens
+
+# Si cambian más productos que esto de una vez (p. ej. una importación) se recarga todo
+RELOAD_THRESHOLD = 2000
+
+PRODUCT_COLUMNS = ("id", "codigo", "nombre", "marca", "categoria", "proveedor", "precio_venta", "stock", "stock_minimo")
+
+
+class Product:
+    """Producto del catálogo en memoria (solo los campos que usa el POS)."""
+    __slots__ = ("id", "codigo", "nombre", "marca", "categoria", "proveedor",
+                 "precio_venta", "stock", "stock_minimo", "sort_key")
+
+    def __init__(self, id, codigo, nombre, marca, categoria, proveedor, precio_venta, stock, stock_minimo):
+        self.id = id
+        self.codigo = codigo
+        self.nombre = nombre
+        self.marca = marca
+        self.categoria = categoria
+        self.proveedor = proveedor
+        self.precio_venta = precio_venta or 0.0
+        self.stock = stock or 0.0
+        self.stock_minimo = stock_minimo or 0.0
+        # Orden del listado: sin mayúsculas ni acentos, y por id para desempatar
+        self.sort_key = (normalize_search_text(nombre), id)
+
+    def search_fields(self):
+        return self.codigo, self.nombre, self.marca, self.categoria, self.proveedor
+
+    def tokens(self):
+        # Un solo paso de normalización sobre todos los campos (el espacio separa palabras igual)
+        return set(search_tokens(" ".join(field for field in self.search_fields() if field)))
+
+
+def product_from_row(row):
+    return Product(*(row[column] for column in PRODUCT_COLUMNS))
+
+
+def build_catalog_indexes(db):
+    """Lee todos los productos y arma los índices del catálogo.
+
+    Corre en un hilo de trabajo (ver `ProductCatalog.load_async`): solo crea
+    estructuras nuevas, no toca las del catálogo que está usando el POS.
+    Devuelve (version, by_id, by_code, order, tokens, token_list).
+    """
+    # La versión se toma antes de leer: un cambio concurrente se reaplica en el siguiente sync()
+    version = db.get_catalog_version()
+    rows = db.fetch_all(f"SELECT {', '.join(PRODUCT_COLUMNS)} FROM productos", row_type="tuple")
+
+    with gc_paused():
+        by_id = {}
+        by_code = {}
+        tokens = {}
+        for row in rows:
+            product = Product(*row)
+            by_id[product.id] = product
+            by_code[product.codigo] = product
+            for token in product.tokens():
+                tokens.setdefault(token, set()).add(product.id)
+        order = sorted(product.sort_key for product in by_id.values())
+    return version, by_id, by_code, order, tokens, sorted(tokens)
+
+
+def product_fields(product):
+    """`row_fields` de SearchController para productos del catálogo."""
+    return product.search_fields()
+
+
+class ProductCatalog:
+    """Productos en memoria con índices por id, código, nombre y palabras (ver la descripción del módulo)."""
+    def __init__(self, db, on_reload=None):
+        self.db = db
+        self.on_reload = on_reload  # se llama en el hilo de Tk cuando termina una carga en segundo plano
+        self.ready = False          # False hasta la primera carga: las consultas van a la base
+        self.loading = False
+        self.version = 0
+        self._by_id = {}
+        self._by_code = {}
+        self._order = []        # claves sort_key ordenadas
+        self._tokens = {}       # palabra -> set de ids
+        self._token_list = []   # palabras distintas, ordenadas
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __contains__(self, product_id):
+        return product_id in self._by_id
+
+    # --- Carga y sincronización ---
+
+    def load(self):
+        """Carga todo el catálogo desde la base en el hilo actual (scripts, pruebas)."""
+        self._install(build_catalog_indexes(self.db))
+
+    def load_async(self):
+        """Arma el catálogo en el pool de lectura; mientras tanto se sigue sirviendo lo que haya."""
+        if self.loading:
+            return
+        self.loading = True
+        self.db.submit(build_catalog_indexes, readonly=True,
+                       callback=self._loaded, error_callback=self._load_failed)
+
+    def _loaded(self, indexes):
+        self.loading = False
+        self._install(indexes)
+        if self.on_reload:
+            self.on_reload()
+
+    def _load_failed(self, error):
+        self.loading = False
+        print(f"Error al cargar el catálogo de productos: {error}")
+
+    def _install(self, indexes):
+        self.version, self._by_id, self._by_code, self._order, self._tokens, self._token_list = indexes
+        self.ready = True
+
+    def sync(self):
+        """Aplica los cambios de la base desde la última carga. Devuelve True si hubo cambios.
+
+        Durante una carga en segundo plano no hace nada: `on_reload` avisa cuando termina.
+        """
+        if not self.ready or self.loading:
+            return False
+        version = self.db.get_catalog_version()
+        if version == self.version:
+            return False
+        if version < self.version:
+            # La versión retrocedió (p. ej. se restauró un backup): el registro de cambios ya no sirve
+            self.load_async()
+            return False
+
+        changes = self.db.get_product_changes(self.version)
+        if len(changes) > RELOAD_THRESHOLD:
+            self.load_async()
+            return False
+
+        for row in changes:
+            if row['id'] is None:
+                self._remove(row['producto_id'])
+            else:
+                self._put(product_from_row(row))
+            version = max(version, row['version'])
+        self.version = version
+        return True
+
+    def _put(self, product):
+        self._remove(product.id)
+        self._by_id[product.id] = product
+        self._by_code[product.codigo] = product
+        insort(self._order, product.sort_key)
+        for token in product.tokens():
+            ids = self._tokens.get(token)
+            if ids is None:
+                ids = self._tokens[token] = set()
+                insort(self._token_list, token)
+            ids.add(product.id)
+
+    def _remove(self, product_id):
+        product = self._by_id.pop(product_id, None)
+        if product is None:
+            return
+        if self._by_code.get(product.codigo) is product:
+            del self._by_code[product.codigo]
+        index = bisect_left(self._order, product.sort_key)
+        if index < len(self._order) and self._order[index] == product.sort_key:
+            del self._order[index]
+        for token in product.tokens():
+            ids = self._tokens.get(token)
+            if ids is None:
+                continue
+            ids.discard(product_id)
+            if not ids:
+                del self._tokens[token]
+                del self._token_list[bisect_left(self._token_list, token)]
+
+    # --- Consultas ---
+
+    def get(self, product_id):
+        if not self.ready:
+            row = self.db.get_product_by_id(product_id)
+            return product_from_row(row) if row else None
+        return self._by_id.get(product_id)
+
+    def get_by_code(self, codigo):
+        if not self.ready:
+            row = self.db.get_product_by_code(codigo)
+            return product_from_row(row) if row else None
+        return self._by_code.get(codigo)
+
+    def stock(self, product_id):
+        product = self.get(product_id)
+        return product.stock if product else 0.0
+
+    def search(self, term, limit=SEARCH_LIMIT):
+        """Productos donde cada palabra de `term` es prefijo de alguna palabra de sus campos.
+
+        Una coincidencia exacta de código va primero; el resto, por nombre.
+        """
+        if not self.ready:
+            return [product_from_row(row) for row in self.db.search_products(term, limit)]
+        tokens = search_tokens(term)
+        if not tokens:
+            return []
+
+        ids = None
+        # Las palabras más largas suelen ser las más selectivas: se intersecta desde ellas
+        for token in sorted(set(tokens), key=len, reverse=True):
+            matched = self._ids_with_prefix(token)
+            ids = matched if ids is None else ids & matched
+            if not ids:
+                return []
+
+        code = term.strip().upper()
+        products = (self._by_id[product_id] for product_id in ids)
+        return heapq.nsmallest(limit, products, key=lambda p: (p.codigo != code, p.sort_key))
+
+    def _ids_with_prefix(self, prefix):
+        ids = set()
+        index = bisect_left(self._token_list, prefix)
+        while index < len(self._token_list) and self._token_list[index].startswith(prefix):
+            ids |= self._tokens[self._token_list[index]]
+            index += 1
+        return ids
+
+    # --- Listado virtual (misma interfaz que get_products_page / get_product_key_at / count_products) ---
+
+    def row_key(self, product):
+        """Clave de paginación de `product` para la fuente actual: `sort_key` o (nombre, id) de la base."""
+        return product.sort_key if self.ready else (product.nombre, product.id)
+
+    def page(self, key=None, limit=50, direction="next"):
+        """Página ordenada por nombre a partir de `key` (ver `row_key`); ver DatabaseManager.get_products_page."""
+        if not self.ready:
+            return [product_from_row(row) for row in self.db.get_products_page(key, limit, direction)]
+        if key is None:
+            start, end = 0, limit
+        elif direction == "prev":
+            end = bisect_left(self._order, key)
+            start = max(0, end - limit)
+        else:
+            start = bisect_left(self._order, key) if direction == "from" else bisect_right(self._order, key)
+            end = start + limit
+        return [self._by_id[product_id] for _, product_id in self._order[start:end]]
+
+    def key_at(self, offset):
+        if not self.ready:
+            return self.db.get_product_key_at(offset)
+        offset = max(0, offset)
+        return self._order[offset] if offset < len(self._order) else None
+
+    def count(self):
+        if not self.ready:
+            return self.db.count_products()
+        return len(self._order)
@@ -0,0 +1,322 @@
+"""
+Importación masiva de productos desde un catálogo CSV o XLSX.
+
+El archivo se lee fila por fila (generadores) y se escribe por lotes de
+`chunk_size` filas con un `executemany` por lote, así que la memoria usada no
+depende del tamaño del catálogo. Cada producto se inserta o, si su código ya
+existe, se actualiza (upsert por `codigo`). Las filas inválidas no detienen la
+importación: se anotan en un reporte CSV junto al archivo de origen.
+
+Uso desde la línea de comandos:
+
+    python -m src.product_import catalogo.csv [--db profitus.db] [--reporte errores.csv]
+"""
+import argparse
+import csv
+import math
+import os
+import sqlite3
+from contextlib import nullcontext
+
+from .utils import normalize_search_text
+
+CHUNK_SIZE = 1000
+
+# Encabezados aceptados para cada columna (se comparan en minúsculas y sin acentos)
+COLUMN_ALIASES = {
+    "codigo": ("codigo", "cod", "code", "sku", "codigo de producto"),
+    "nombre": ("nombre", "descripcion", "producto", "name", "nombre del producto"),
+    "stock": ("stock", "existencia", "cantidad", "stock inicial"),
+    "stock_minimo": ("stock_minimo", "stock minimo", "minimo", "stock min"),
+    "precio_venta": ("precio_venta", "precio venta", "precio", "pvp", "venta", "venta (usd)"),
+    "precio_costo": ("precio_costo", "precio costo", "costo", "costo (usd)"),
+    "categoria": ("categoria", "category", "rubro"),
+    "proveedor": ("proveedor", "supplier"),
+    "marca": ("marca", "brand"),
+}
+REQUIRED_COLUMNS = ("codigo", "nombre", "precio_venta", "precio_costo")
+
+# Las columnas opcionales vacías o ausentes conservan el valor actual del producto
+UPSERT_SQL = """
+    INSERT INTO productos
+        (codigo, nombre, stock, precio_venta, precio_costo, categoria, proveedor, stock_minimo, marca)
+    VALUES
+        (:codigo, :nombre, COALESCE(:stock, 0), :precio_venta, :precio_costo,
+         :categoria, :proveedor, COALESCE(:stock_minimo, 0), :marca)
+    ON CONFLICT(codigo) DO UPDATE SET
+        nombre = excluded.nombre,
+        precio_venta = excluded.precio_venta,
+        precio_costo = excluded.precio_costo,
+        stock = COALESCE(:stock, productos.stock),
+        stock_minimo = COALESCE(:stock_minimo, productos.stock_minimo),
+        categoria = COALESCE(:categoria, productos.categoria),
+        proveedor = COALESCE(:proveedor, productos.proveedor),
+        marca = COALESCE(:marca, productos.marca)
+"""
+
+
+def read_rows(path):
+    """Genera `(número de fila, valores)` del archivo; la primera fila son los encabezados."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".xlsx", ".xlsm"):
+        return _read_xlsx(path)
+    return _read_csv(path)
+
+
+def _read_csv(path):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        sample = f.read(4096)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        for line_number, row in enumerate(csv.reader(f, dialect), start=1):
+            yield line_number, row
+
+
+def _read_xlsx(path):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise RuntimeError("Para importar archivos .xlsx se necesita el paquete 'openpyxl' (pip install openpyxl).")
+
+    # read_only recorre la hoja sin cargarla completa en memoria
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        for line_number, row in enumerate(sheet.iter_rows(values_only=True), start=1):
+            yield line_number, row
+    finally:
+        workbook.close()
+
+
+def map_columns(header):
+    """Devuelve {columna: índice} a partir de la fila de encabezados."""
+    aliases = {_header_key(alias): column for column, names in COLUMN_ALIASES.items() for alias in names}
+    mapping = {}
+    for index, title in enumerate(header):
+        column = aliases.get(_header_key(title))
+        if column and column not in mapping:
+            mapping[column] = index
+    missing = [column for column in REQUIRED_COLUMNS if column not in mapping]
+    if missing:
+        raise ValueError(f"Faltan columnas obligatorias en el archivo: {', '.join(missing)}")
+    return mapping
+
+
+def _header_key(title):
+    return " ".join(normalize_search_text(title).replace("_", " ").split())
+
+
+def parse_number(value):
+    """Convierte '1.234,56', '1,234.56', '$ 12,5' o un número de Excel a float (None si está vacío)."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return _finite(float(value))
+    text = str(value).strip().replace("$", "").replace(" ", "")
+    if not text:
+        return None
+    if "," in text and "." in text:
+        # El separador que aparece último es el decimal
+        if text.rfind(",") > text.rfind("."):
+            text = text.replace(".", "").replace(",", ".")
+        else:
+            text = text.replace(",", "")
+    else:
+        text = text.replace(",", ".")
+    return _finite(float(text))
+
+
+def _finite(number):
+    # float() acepta 'nan', 'inf' e 'infinity'; en SQLite pasarían todas las validaciones
+    if not math.isfinite(number):
+        raise ValueError(f"Número no finito: {number!r}")
+    return number
+
+
+def _text(value):
+    if value is None:
+        return None
+    text = str(value).strip()
+    return text or None
+
+
+def parse_product(row, mapping):
+    """Valida una fila y devuelve los parámetros de UPSERT_SQL; lanza ValueError con el motivo."""
+    def cell(column):
+        index = mapping.get(column)
+        return row[index] if index is not None and index < len(row) else None
+
+    codigo = _text(cell("codigo"))
+    nombre = _text(cell("nombre"))
+    if not codigo or not nombre:
+        raise ValueError("El código y el nombre son obligatorios.")
+
+    numbers = {}
+    for column in ("stock", "stock_minimo", "precio_venta", "precio_costo"):
+        try:
+            numbers[column] = parse_number(cell(column))
+        except ValueError:
+            raise ValueError(f"Valor numérico inválido en '{column}': {cell(column)!r}")
+
+    if (numbers["precio_venta"] or 0) <= 0 or (numbers["precio_costo"] or 0) <= 0:
+        raise ValueError("Los precios de venta y costo deben ser mayores a cero.")
+    if (numbers["stock"] or 0) < 0 or (numbers["stock_minimo"] or 0) < 0:
+        raise ValueError("El stock y el stock mínimo no pueden ser negativos.")
+
+    return {
+        "codigo": codigo.upper(),
+        "nombre": nombre,
+        "categoria": _text(cell("categoria")),
+        "proveedor": _text(cell("proveedor")),
+        "marca": _text(cell("marca")),
+        **numbers,
+    }
+
+
+class ErrorReport:
+    """Escribe las filas rechazadas a un CSV a medida que aparecen (el archivo se crea con el primer error).
+
+    El reporte de una importación anterior se borra al empezar: si esta no rechaza
+    filas, no debe quedar un archivo de errores que no le corresponde.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._file = None
+        self._writer = None
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Advertencia: no se pudo borrar el reporte de errores anterior {path}: {e}")
+
+    def add(self, line_number, codigo, message):
+        if self._writer is None:
+            self._file = open(self.path, "w", newline="", encoding="utf-8-sig")
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(("fila", "codigo", "error"))
+        self._writer.writerow((line_number, codigo or "", message))
+        self.count += 1
+
+    def close(self):
+        if self._file:
+            self._file.close()
+
+
+def default_report_path(path):
+    base, _ = os.path.splitext(path)
+    return f"{base}_errores.csv"
+
+
+def import_products(db, path, progress=None, report_path=None, chunk_size=CHUNK_SIZE):
+    """Importa el catálogo `path` en la base de `db`.
+
+    `progress(procesadas, importadas, rechazadas)` se llama después de cada lote.
+    Devuelve (True, mensaje) al terminar, o (False, mensaje) si el archivo no se
+    pudo leer; las filas inválidas quedan en el reporte de errores.
+    """
+    report = ErrorReport(report_path or default_report_path(path))
+    processed = imported = 0
+    try:
+        rows = read_rows(path)
+        mapping = None
+        chunk = []
+        for line_number, row in rows:
+            if mapping is None:
+                mapping = map_columns(row)
+                continue
+            if not any(_text(value) for value in row):
+                continue  # fila vacía
+            processed += 1
+            try:
+                chunk.append((line_number, parse_product(row, mapping)))
+            except ValueError as e:
+                codigo = row[mapping["codigo"]] if mapping["codigo"] < len(row) else None
+                report.add(line_number, _text(codigo), str(e))
+
+            if len(chunk) >= chunk_size:
+                imported += _write_chunk(db, chunk, report)
+                chunk = []
+                if progress:
+                    progress(processed, imported, report.count)
+
+        if mapping is None:
+            return False, "El archivo está vacío."
+        if chunk:
+            imported += _write_chunk(db, chunk, report)
+        if progress:
+            progress(processed, imported, report.count)
+
+    except (OSError, ValueError, RuntimeError, csv.Error) as e:
+        return False, f"No se pudo importar el archivo: {e}"
+    finally:
+        report.close()
+
+    message = f"{imported} de {processed} productos importados."
+    if report.count:
+        message += f"\n{report.count} filas rechazadas (ver {report.path})."
+    return True, message
+
+
+def _write_chunk(db, chunk, report):
+    """Escribe un lote en una transacción; si falla, lo reintenta fila por fila para aislar las filas malas."""
+    try:
+        with db.transaction():
+            db.execute_many(UPSERT_SQL, [params for _, params in chunk])
+        return len(chunk)
+    except sqlite3.Error:
+        pass
+
+    written = 0
+    failed = set()
+    # Localmente las filas van en una transacción con un SAVEPOINT por fila. Contra un servidor
+    # de tienda las escrituras de una transacción viajan juntas al cerrarla, así que cada fila
+    # se envía en su propia transacción para que el error de una no arrastre a las demás
+    try:
+        with nullcontext() if db.remote else db.transaction():
+            for line_number, params in chunk:
+                try:
+                    with db.transaction():
+                        db.execute_query(UPSERT_SQL, params)
+                    written += 1
+                except sqlite3.Error as e:
+                    failed.add(line_number)
+                    report.add(line_number, params["codigo"], f"Error de base de datos: {e}")
+    except sqlite3.Error as e:
+        # No se pudo confirmar el lote: ninguna fila quedó escrita y todas pasan al reporte
+        written = 0
+        for line_number, params in chunk:
+            if line_number not in failed:
+                report.add(line_number, params["codigo"], f"Error de base de datos: {e}")
+    return written
+
+
+def main(argv=None):
+    from .db_manager import DatabaseManager, DB_FILE
+
+    parser = argparse.ArgumentParser(description="Importa productos desde un archivo CSV o XLSX.")
+    parser.add_argument("archivo", help="catálogo a importar (.csv o .xlsx)")
+    parser.add_argument("--db", default=DB_FILE, help=f"base de datos (por defecto {DB_FILE})")
+    parser.add_argument("--reporte", help="archivo CSV para las filas rechazadas")
+    parser.add_argument("--lote", type=int, default=CHUNK_SIZE, help="filas por transacción")
+    args = parser.parse_args(argv)
+
+    db = DatabaseManager(args.db)
+    try:
+        success, message = import_products(
+            db, args.archivo,
+            progress=lambda done, ok, failed: print(f"\r{done} filas procesadas ({failed} rechazadas)", end="", flush=True),
+            report_path=args.reporte, chunk_size=args.lote)
+    finally:
+        db.close()
+    print()
+    print(message)
+    return 0 if success else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
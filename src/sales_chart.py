@@ -0,0 +1,109 @@
+import customtkinter as ctk
+
+BACKGROUND_DARK = "#0D1B2A"
+FRAME_MID = "#1B263B"
+ACCENT_CYAN = "#00FFFF"
+
+MIN_BAR_PIXELS = 4      # con barras más angostas se agrupan períodos
+MAX_TICK_LABELS = 12
+BAR_WIDTH = 0.8
+
+
+def decimate(labels, values, max_points):
+    """Si hay más puntos que `max_points`, agrupa puntos consecutivos sumando sus valores.
+
+    Cada grupo conserva la etiqueta de su primer punto.
+    """
+    count = len(values)
+    if count <= max_points:
+        return list(labels), list(values)
+    size = -(-count // max_points)  # división redondeando hacia arriba
+    return ([labels[i] for i in range(0, count, size)],
+            [sum(values[i:i + size]) for i in range(0, count, size)])
+
+
+class SalesChart(ctk.CTkFrame):
+    """Gráfico de barras de una serie de ventas que se actualiza sin rehacer la figura.
+
+    - matplotlib se importa al mostrarse el gráfico por primera vez (evento <Map>),
+      no al importar el módulo, así que no suma tiempo al arranque de la aplicación.
+    - Las barras se reutilizan: cada actualización cambia posición, alto y
+      visibilidad de los rectángulos existentes y solo crea los que faltan.
+    - Si hay más puntos que píxeles disponibles, se agrupan (`decimate`).
+    - Se redibuja con `draw_idle`, que junta varias actualizaciones en un solo dibujo.
+    """
+    def __init__(self, master, title="Ventas por Fecha", bar_color=ACCENT_CYAN, figsize=(8, 3), dpi=100):
+        super().__init__(master, fg_color="transparent")
+        self.title = title
+        self.bar_color = bar_color
+        self.figsize = figsize
+        self.dpi = dpi
+
+        self.canvas = None
+        self._bars = []
+        self._pending = None  # serie recibida antes de construir el gráfico
+        self.bind("<Map>", self._on_map, add="+")
+
+    def _on_map(self, event=None):
+        if self.canvas is None:
+            self._build()
+
+    def _build(self):
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+        # Figure directa (sin pyplot): no queda registrada en el estado global de matplotlib
+        self.fig = Figure(figsize=self.figsize, dpi=self.dpi, facecolor=BACKGROUND_DARK)
+        self.ax = self.fig.add_subplot()
+        self.ax.set_facecolor(FRAME_MID)
+        self.ax.tick_params(axis='x', colors='white', labelrotation=45)
+        self.ax.tick_params(axis='y', colors='white')
+        self.ax.set_title(self.title, color="white")
+        # Márgenes fijos en lugar de tight_layout() en cada actualización
+        self.fig.subplots_adjust(left=0.1, right=0.98, top=0.88, bottom=0.3)
+
+        self.canvas = FigureCanvasTkAgg(self.fig, master=self)
+        self.canvas.get_tk_widget().pack(fill="both", expand=True)
+
+        if self._pending is not None:
+            self.set_series(*self._pending)
+
+    def set_series(self, labels, values):
+        """Muestra `values` (uno por período) con sus etiquetas."""
+        if self.canvas is None:
+            self._pending = (labels, values)
+            return
+        self._pending = None
+
+        width = self.canvas.get_tk_widget().winfo_width()
+        if width <= 1:
+            width = self.figsize[0] * self.dpi  # todavía sin tamaño real
+        labels, values = decimate(labels, values, max(1, int(width * 0.85) // MIN_BAR_PIXELS))
+
+        self._update_bars(values)
+
+        count = len(values)
+        step = max(1, -(-count // MAX_TICK_LABELS))
+        positions = list(range(0, count, step))
+        self.ax.set_xticks(positions)
+        self.ax.set_xticklabels([labels[i] for i in positions], ha="right")
+        self.ax.set_xlim(-0.5, max(count, 1) - 0.5)
+        self.ax.set_ylim(0, (max(values) * 1.1) if values and max(values) > 0 else 1)
+
+        self.canvas.draw_idle()
+
+    def _update_bars(self, values):
+        missing = len(values) - len(self._bars)
+        if missing > 0:
+            start = len(self._bars)
+            container = self.ax.bar(range(start, start + missing), [0] * missing,
+                                    width=BAR_WIDTH, color=self.bar_color)
+            self._bars.extend(container.patches)
+
+        for index, bar in enumerate(self._bars):
+            if index < len(values):
+                bar.set_x(index - BAR_WIDTH / 2)
+                bar.set_height(values[index])
+                bar.set_visible(True)
+            else:
+                bar.set_visible(False)
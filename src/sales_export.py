@@ -0,0 +1,56 @@
+"""
+Exportación del reporte de ventas a CSV directamente desde SQLite.
+
+Las filas se leen del cursor por lotes (`DatabaseManager.iter_sales_export`) y se
+escriben al archivo a medida que llegan, sin pasar por el Treeview ni cargar el
+resultado completo en memoria. Si la ruta termina en `.gz` el CSV se comprime
+con gzip. El archivo se escribe primero como `<ruta>.part` y se renombra al
+terminar, así una exportación fallida no deja un CSV a medias.
+"""
+import csv
+import gzip
+import os
+
+EXPORT_BATCH_SIZE = 2000
+
+SALES_HEADER = ["ID Venta", "Fecha", "Vendedor", "Total Bs", "Total USD"]
+DETAIL_HEADER = ["ID Producto", "Producto", "Cantidad", "Precio Unitario USD",
+                 "Precio Unitario Bs", "Subtotal USD", "Subtotal Bs"]
+
+
+def _open_output(path, compress):
+    if compress:
+        # Nivel 6 (el de zlib): casi la misma compresión que 9 en bastante menos tiempo
+        return gzip.open(path, "wt", newline="", encoding="utf-8", compresslevel=6)
+    return open(path, "w", newline="", encoding="utf-8")
+
+
+def export_sales(db, path, start_date=None, end_date=None, seller=None, include_details=False,
+                 progress=None, batch_size=EXPORT_BATCH_SIZE):
+    """Exporta las ventas filtradas a `path` (CSV, o CSV gzip si termina en .gz).
+
+    Con `include_details` se escribe una fila por producto vendido. Llama a
+    `progress(filas_escritas, total)` después de cada lote. Devuelve (éxito, mensaje).
+    """
+    total = db.count_sales(start_date, end_date, seller, include_details)
+    header = SALES_HEADER + DETAIL_HEADER if include_details else SALES_HEADER
+
+    temp_path = path + ".part"
+    written = 0
+    try:
+        with _open_output(temp_path, compress=path.lower().endswith(".gz")) as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            for rows in db.iter_sales_export(start_date, end_date, seller, include_details, batch_size):
+                writer.writerows(rows)
+                written += len(rows)
+                if progress:
+                    progress(written, total)
+        os.replace(temp_path, path)
+    except Exception as e:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        print(f"Error al exportar ventas: {e}")
+        return False, f"No se pudo exportar el archivo: {e}"
+
+    return True, f"{written} filas exportadas en:\n{path}"
@@ -1,9 +1,15 @@
 import customtkinter as ctk
 from tkinter import ttk, messagebox, filedialog
 from datetime import datetime
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import csv
+from .tree_grid import TreeGrid
+from .sales_chart import SalesChart
+from .db_manager import DatabaseManager, REPORT_PAGE_SIZE
+from .sales_export import export_sales
+
+PAGE_SIZE_OPTIONS = ["50", "100", "250", "500"]
+
+# Opciones de agrupación del gráfico -> granularidad de DatabaseManager.get_sales_timeseries
+CHART_GRANULARITIES = {"Por Día": "day", "Por Semana": "week", "Por Mes": "month"}
 
 
 class SalesReportPage(ctk.CTkFrame):
@@ -45,6 +51,15 @@ class SalesReportPage(ctk.CTkFrame):
         search_button = ctk.CTkButton(filter_frame, text="🔍 Buscar", command=self.load_report)
         search_button.grid(row=0, column=6, sticky="ew", padx=10, pady=10)
         
+        self.granularity_combobox = ctk.CTkComboBox(filter_frame, state="readonly", width=120,
+                                                    values=list(CHART_GRANULARITIES), command=lambda _: self.load_chart())
+        self.granularity_combobox.set("Por Día")
+        self.granularity_combobox.grid(row=0, column=7, sticky="ew", padx=10, pady=10)
+        
+        self.report_filters = None
+        self.page_keys = [None]  # clave (fecha, id) después de la cual empieza cada página visitada
+        self.next_key = None
+        
         self.sales_tree = ttk.Treeview(self, columns=("id", "date", "seller", "total_bs", "total_usd"), show="headings")
         self.sales_tree.heading("id", text="ID Venta")
         self.sales_tree.heading("date", text="Fecha")
@@ -61,17 +76,46 @@ class SalesReportPage(ctk.CTkFrame):
         scrollbar = ctk.CTkScrollbar(self, command=self.sales_tree.yview)
         scrollbar.grid(row=2, column=1, sticky="ns", pady=10)
         self.sales_tree.configure(yscrollcommand=scrollbar.set)
+        self.sales_grid = TreeGrid(self.sales_tree)
+        
+        bottom_frame = ctk.CTkFrame(self, fg_color="transparent")
+        bottom_frame.grid(row=3, column=0, sticky="new", padx=20, pady=10)
+        bottom_frame.grid_columnconfigure(5, weight=1)
+        
+        self.prev_page_button = ctk.CTkButton(bottom_frame, text="◀", width=40, state="disabled", command=self.previous_page)
+        self.prev_page_button.grid(row=0, column=0)
+        self.page_label = ctk.CTkLabel(bottom_frame, text="Página 1", width=80)
+        self.page_label.grid(row=0, column=1, padx=5)
+        self.next_page_button = ctk.CTkButton(bottom_frame, text="▶", width=40, state="disabled", command=self.next_page)
+        self.next_page_button.grid(row=0, column=2)
+        
+        self.page_size_combobox = ctk.CTkComboBox(bottom_frame, state="readonly", width=80, values=PAGE_SIZE_OPTIONS,
+                                                  command=lambda _: self.first_page())
+        self.page_size_combobox.set(str(REPORT_PAGE_SIZE))
+        self.page_size_combobox.grid(row=0, column=3, padx=(10, 0))
+        ctk.CTkLabel(bottom_frame, text="por página").grid(row=0, column=4, padx=5)
         
-        export_button = ctk.CTkButton(self, text="📁 Exportar CSV", command=self.export_csv)
-        export_button.grid(row=3, column=0, sticky="e", padx=20, pady=10)
+        # Totales de todo el rango filtrado, no solo de la página visible
+        self.totals_label = ctk.CTkLabel(bottom_frame, text="", text_color="#00FFFF", anchor="w")
+        self.totals_label.grid(row=0, column=5, sticky="ew", padx=10)
         
-        self.fig, self.ax = plt.subplots(figsize=(8, 3), dpi=100)
-        self.fig.patch.set_facecolor("#0D1B2A")
-        self.ax.set_facecolor("#1B263B")
-        self.ax.tick_params(axis='x', colors='white')
-        self.ax.tick_params(axis='y', colors='white')
-        self.canvas = FigureCanvasTkAgg(self.fig, master=self)
-        self.canvas.get_tk_widget().grid(row=4, column=0, columnspan=2, sticky="nsew", padx=20, pady=20)
+        export_frame = ctk.CTkFrame(bottom_frame, fg_color="transparent")
+        export_frame.grid(row=0, column=6, sticky="e")
+        
+        self.export_details_var = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(export_frame, text="Incluir detalle de productos", 
+                        variable=self.export_details_var).grid(row=0, column=0, padx=10)
+        
+        # Se muestra solo mientras se exporta
+        self.export_progress = ctk.CTkProgressBar(export_frame, width=200)
+        self.export_progress.set(0)
+        
+        self.export_button = ctk.CTkButton(export_frame, text="📁 Exportar CSV", command=self.export_csv)
+        self.export_button.grid(row=0, column=2)
+        
+        # matplotlib se carga recién cuando el gráfico se muestra por primera vez
+        self.chart = SalesChart(self)
+        self.chart.grid(row=4, column=0, columnspan=2, sticky="nsew", padx=20, pady=20)
 
 
     def _load_sellers(self):
@@ -81,7 +125,8 @@ class SalesReportPage(ctk.CTkFrame):
         self.seller_combobox.set("Todos")
 
 
-    def load_report(self):
+    def _read_filters(self):
+        """Devuelve (desde, hasta, vendedor) de los filtros, o None si alguna fecha es inválida."""
         start_date = self.start_date_entry.get().strip()
         end_date = self.end_date_entry.get().strip()
         seller = self.seller_combobox.get()
@@ -93,33 +138,86 @@ class SalesReportPage(ctk.CTkFrame):
                 datetime.strptime(end_date, "%Y-%m-%d")
         except ValueError:
             messagebox.showerror("Error", "Fecha inválida, debe ser formato YYYY-MM-DD")
-            return
+            return None
         
-        query = "SELECT ventas.id, ventas.fecha, usuarios.nombre_completo, ventas.total_bs, ventas.total_usd FROM ventas JOIN usuarios ON ventas.user_id = usuarios.id WHERE 1=1"
-        params = []
-        
-        if start_date:
-            query += " AND date(ventas.fecha) >= date(?)"
-            params.append(start_date)
-        if end_date:
-            query += " AND date(ventas.fecha) <= date(?)"
-            params.append(end_date)
-        if seller and seller != "Todos":
-            query += " AND usuarios.nombre_completo = ?"
-            params.append(seller)
-        
-        query += " ORDER BY ventas.fecha DESC"
-        
-        results = self.db.fetch_all(query, tuple(params))
-        
-        for i in self.sales_tree.get_children():
-            self.sales_tree.delete(i)
-        
-        for row in results:
-            values = [row[col] for col in row.keys()]
-            self.sales_tree.insert("", "end", values=values)
+        if seller == "Todos":
+            seller = None
+        return start_date or None, end_date or None, seller
+
+
+    def load_report(self):
+        filters = self._read_filters()
+        if filters is None:
+            return
+        self.report_filters = filters
+        self.page_keys = [None]
+        self.refresh_report()
+
+
+    def refresh_report(self):
+        """Vuelve a leer la página actual, los totales y el gráfico con los filtros aplicados."""
+        if self.report_filters is None:
+            return
+        self.load_page()
+        self.db.submit(DatabaseManager.get_sales_report_totals, *self.report_filters,
+                       callback=self._show_totals, readonly=True)
+        self.load_chart()
+
+
+    def load_page(self):
+        """Carga una página del reporte por clave (fecha, id): el costo no depende de cuántas páginas haya antes."""
+        page_size = int(self.page_size_combobox.get())
+        # Se pide una fila de más para saber si existe una página siguiente
+        self.db.submit(DatabaseManager.get_sales_report_page, *self.report_filters, self.page_keys[-1], page_size + 1,
+                       row_type="record", callback=lambda rows: self._show_report(rows, page_size), readonly=True,
+                       error_callback=lambda e: messagebox.showerror("Error", f"No se pudo cargar el reporte:\n{e}"))
+
+
+    def first_page(self):
+        if self.report_filters is None:
+            return
+        self.page_keys = [None]
+        self.load_page()
+
+
+    def next_page(self):
+        if self.next_key:
+            self.page_keys.append(self.next_key)
+            self.load_page()
+
+
+    def previous_page(self):
+        if len(self.page_keys) > 1:
+            self.page_keys.pop()
+            self.load_page()
+
+
+    def load_chart(self):
+        """Pide la serie del gráfico ya agregada en SQLite (ver DatabaseManager.get_sales_timeseries)."""
+        if self.report_filters is None:
+            return
+        start_date, end_date, seller = self.report_filters
+        granularity = CHART_GRANULARITIES[self.granularity_combobox.get()]
+        self.db.submit(DatabaseManager.get_sales_timeseries, start_date, end_date, granularity, seller,
+                       callback=self.update_chart, readonly=True)
+
+
+    def _show_report(self, results, page_size):
+        rows = results[:page_size]
+        self.next_key = (rows[-1].fecha, rows[-1].id) if len(results) > page_size else None
+        # Los registros ya son tuplas: van directo como valores de la fila
+        self.sales_grid.set_rows((row.id, row, ()) for row in rows)
+        self.sales_tree.yview_moveto(0)
         
-        self.update_chart(results)
+        page = len(self.page_keys)
+        self.page_label.configure(text=f"Página {page}")
+        self.prev_page_button.configure(state="normal" if page > 1 else "disabled")
+        self.next_page_button.configure(state="normal" if self.next_key else "disabled")
+
+
+    def _show_totals(self, totals):
+        self.totals_label.configure(text=f"{totals['num_ventas']:,} ventas  ·  "
+                                         f"Total: Bs {totals['total_bs']:,.2f} / $ {totals['total_usd']:,.2f}")
 
 
     def on_sale_double_click(self, event):
@@ -159,11 +257,7 @@ class SalesReportPage(ctk.CTkFrame):
     def load_sale_details(self):
         for i in self.detail_tree.get_children():
             self.detail_tree.delete(i)
-        query = """
-            SELECT nombre_producto, cantidad, precio_unitario_usd, precio_unitario_bs, subtotal_usd, subtotal_bs, id
-            FROM detalles_venta WHERE venta_id = ?
-        """
-        rows = self.db.fetch_all(query, (self.current_venta_id,))
+        rows = self.db.get_sale_details(self.current_venta_id)
         self.product_ids = []  # Para guardar ids de detalles_venta en misma orden que la tabla
         for r in rows:
             values = list(r[:-1])  # Todos menos el id que no se muestra en tabla
@@ -189,16 +283,14 @@ class SalesReportPage(ctk.CTkFrame):
                 messagebox.showerror("Error", "Cantidad inválida")
                 return
             product_id = self.product_ids[index]
-            query = """
-                UPDATE detalles_venta SET cantidad = ?,
-                subtotal_usd = precio_unitario_usd * ?,
-                subtotal_bs = precio_unitario_bs * ?
-                WHERE id = ?
-            """
-            self.db.execute_query(query, (new_qty, new_qty, new_qty, product_id))
+            success, message = self.db.update_sale_line_quantity(product_id, new_qty)
+            if not success:
+                messagebox.showerror("Error", message)
+                return
             self.load_sale_details()
+            self.refresh_report()
             edit_win.destroy()
-            messagebox.showinfo("Éxito", "Cantidad actualizada correctamente.")
+            messagebox.showinfo("Éxito", message)
 
         edit_win = ctk.CTkToplevel()
         edit_win.title("Editar Cantidad")
@@ -221,48 +313,51 @@ class SalesReportPage(ctk.CTkFrame):
         index = self.detail_tree.index(selected[0])
         product_id = self.product_ids[index]
 
-        query = "DELETE FROM detalles_venta WHERE id = ?"
-        self.db.execute_query(query, (product_id,))
+        success, message = self.db.delete_sale_line(product_id)
+        if not success:
+            messagebox.showerror("Error", message)
+            return
         self.load_sale_details()
-        messagebox.showinfo("Éxito", "Producto eliminado correctamente.")
-
-
-    def update_chart(self, data):
-        self.ax.clear()
-        self.ax.set_facecolor("#1B263B")
-        self.ax.tick_params(axis='x', colors='white')
-        self.ax.tick_params(axis='y', colors='white')
-        self.ax.set_title("Ventas por Fecha", color="white")
+        self.refresh_report()
+        messagebox.showinfo("Éxito", message)
 
-        date_totals = {}
-        for row in data:
-            date_str = row['fecha'][:10]
-            total_bs = row['total_bs']
-            date_totals[date_str] = date_totals.get(date_str, 0) + total_bs
 
-        dates = sorted(date_totals.keys())
-        totals = [date_totals[d] for d in dates]
-
-        self.ax.bar(dates, totals, color="#00FFFF")
-        self.ax.tick_params(axis='x', rotation=45)
-        self.fig.tight_layout()
-        self.canvas.draw()
+    def update_chart(self, series):
+        self.chart.set_series(series["periodos"], series["total_bs"])
 
 
     def export_csv(self):
-        rows = [self.sales_tree.item(i)["values"] for i in self.sales_tree.get_children()]
-        if not rows:
-            messagebox.showinfo("Aviso", "No hay datos para exportar.")
+        """Exporta las ventas que cumplen los filtros leyendo directo de la base, en segundo plano."""
+        filters = self._read_filters()
+        if filters is None:
             return
-        path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("Archivos CSV", "*.csv")])
+        path = filedialog.asksaveasfilename(defaultextension=".csv", 
+                                            filetypes=[("Archivos CSV", "*.csv"), ("CSV comprimido", "*.csv.gz")])
         if not path:
             return
-        try:
-            with open(path, "w", newline="", encoding="utf-8") as f:
-                writer = csv.writer(f)
-                writer.writerow(["ID Venta", "Fecha", "Vendedor", "Total Bs", "Total USD"])
-                for row in rows:
-                    writer.writerow(row)
-            messagebox.showinfo("Exportado", f"Reporte exportado correctamente en:\n{path}")
-        except Exception as e:
-            messagebox.showerror("Error", f"No se pudo exportar el archivo:\n{e}")
+        include_details = self.export_details_var.get()
+        
+        self.export_button.configure(state="disabled", text="Exportando...")
+        self.export_progress.set(0)
+        self.export_progress.grid(row=0, column=1, padx=10)
+        
+        def run_export(db):
+            return export_sales(db, path, *filters, include_details=include_details,
+                                progress=lambda done, total: db.post_to_ui(self._show_export_progress, done, total))
+        
+        self.db.submit(run_export, callback=self._on_export_finished, readonly=True,
+                       error_callback=lambda e: self._on_export_finished((False, f"No se pudo exportar el archivo:\n{e}")))
+
+
+    def _show_export_progress(self, done, total):
+        self.export_progress.set(done / total if total else 1)
+
+
+    def _on_export_finished(self, result):
+        success, message = result
+        self.export_progress.grid_forget()
+        self.export_button.configure(state="normal", text="📁 Exportar CSV")
+        if success:
+            messagebox.showinfo("Exportado", f"Reporte exportado correctamente.\n{message}")
+        else:
+            messagebox.showerror("Error", message)
@@ -0,0 +1,91 @@
+from .db_manager import SEARCH_LIMIT
+from .utils import matches_search_terms
+
+SEARCH_DELAY_MS = 120
+
+
+class SearchController:
+    """Búsqueda mientras se escribe, con debounce y reutilización de resultados.
+
+    - Agrupa las pulsaciones: cada tecla cancela el `after` pendiente y solo se
+      consulta cuando el usuario deja de escribir durante `delay_ms`.
+    - Si el término no cambió respecto a la última búsqueda, no se consulta.
+    - Si el término nuevo extiende al anterior ("mou" -> "mous") y la consulta
+      anterior no fue truncada por `limit`, se filtran en memoria las filas ya
+      obtenidas en lugar de volver a SQLite.
+    - Antes de entregar resultados se comprueba que el texto no haya cambiado,
+      para no pintar resultados ya superados.
+
+    `fetch(term)` devuelve las filas; `on_results(term, rows)` las muestra
+    (con `term` vacío y `rows` vacío cuando no hay nada que buscar).
+    `row_fields(row)` devuelve los textos de la fila usados para filtrar en memoria.
+    """
+    def __init__(self, entry, fetch, on_results, row_fields, delay_ms=SEARCH_DELAY_MS, limit=SEARCH_LIMIT):
+        self.entry = entry
+        self.fetch = fetch
+        self.on_results = on_results
+        self.row_fields = row_fields
+        self.delay_ms = delay_ms
+        self.limit = limit
+
+        self._job = None
+        self.last_term = None
+        self.cached_rows = None
+
+    def schedule(self, event=None):
+        """Programa la búsqueda (handler de <KeyRelease>)."""
+        self.cancel()
+        self._job = self.entry.after(self.delay_ms, self.run_now)
+
+    def cancel(self):
+        if self._job is not None:
+            self.entry.after_cancel(self._job)
+            self._job = None
+
+    def reset(self):
+        """Olvida el último término y los resultados guardados (p. ej. si cambió el catálogo)."""
+        self.last_term = None
+        self.cached_rows = None
+
+    def refresh(self):
+        """Vuelve a mostrar el término actual; reutiliza las filas guardadas si el término no cambió."""
+        self.cancel()
+        term = self._current_term()
+        if term and term == self.last_term and self.cached_rows is not None:
+            self.on_results(term, self.cached_rows)
+        else:
+            self.run_now(force=True)
+
+    def run_now(self, force=False):
+        self._job = None
+        term = self._current_term()
+        if term == self.last_term and not force:
+            return
+
+        if not term:
+            rows = []
+        elif self._is_refinement(term):
+            rows = [row for row in self.cached_rows if matches_search_terms(term, *self.row_fields(row))]
+        else:
+            rows = list(self.fetch(term))
+
+        if term != self._current_term():
+            return  # el usuario siguió escribiendo: estos resultados ya no sirven
+
+        self.last_term = term
+        self.cached_rows = rows if term else None
+        self.on_results(term, rows)
+
+    def _is_refinement(self, term):
+        return (self.cached_rows is not None
+                and self.last_term
+                and term.startswith(self.last_term)
+                and len(self.cached_rows) < self.limit)
+
+    def _current_term(self):
+        return self.entry.get().strip()
+
+
+def product_search_fields(row):
+    """Campos de un producto que cubre el índice de búsqueda (ver DatabaseManager.search_products)."""
+    return row['codigo'], row['nombre'], row['marca'], row['categoria'], row['proveedor']
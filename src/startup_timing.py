@@ -0,0 +1,88 @@
+"""
+Medición del tiempo de arranque.
+
+Se activa con la variable de entorno PROFITUS_STARTUP_TIMING=1:
+
+    PROFITUS_STARTUP_TIMING=1 python -m src.main
+
+Cada bloque envuelto en `measure(...)` (importaciones, creación de la ventana,
+construcción de cada página) queda registrado, y `report()` imprime el desglose
+en consola. Para ver el costo de cada módulo importado se puede combinar con
+el `-X importtime` de Python y resumir su salida con este mismo módulo:
+
+    python -X importtime -m src.main 2> importtime.log
+    python -m src.startup_timing importtime.log
+"""
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+ENABLED = os.environ.get("PROFITUS_STARTUP_TIMING") == "1"
+IMPORTTIME_TOP = 25
+
+_START = time.perf_counter()
+_records = []  # (etiqueta, segundos)
+
+
+@contextmanager
+def measure(label):
+    """Registra cuánto tarda el bloque `with` (solo si la medición está activa)."""
+    if not ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _records.append((label, time.perf_counter() - start))
+
+
+def report(title="arranque", since_start=True):
+    """Imprime y descarta los tiempos registrados.
+
+    Con `since_start` agrega el tiempo total desde que se importó este módulo
+    (útil solo en el primer reporte: después incluye la espera del usuario).
+    """
+    if not ENABLED:
+        return
+    total = time.perf_counter() - _START
+    print(f"--- Tiempos de {title} ---")
+    for label, seconds in _records:
+        print(f"{seconds * 1000:9.1f} ms  {label}")
+    if since_start:
+        print(f"{total * 1000:9.1f} ms  TOTAL desde el inicio")
+    _records.clear()
+
+
+def summarize_importtime(path, top=IMPORTTIME_TOP):
+    """Devuelve los `top` módulos con mayor tiempo acumulado de un log de `-X importtime`.
+
+    Cada elemento es (módulo, propio_us, acumulado_us), ordenado por tiempo acumulado.
+    """
+    modules = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.startswith("import time:"):
+                continue
+            fields = line[len("import time:"):].split("|")
+            if len(fields) != 3 or not fields[0].strip().isdigit():
+                continue  # línea de encabezado
+            modules.append((fields[2].strip(), int(fields[0]), int(fields[1])))
+    modules.sort(key=lambda item: item[2], reverse=True)
+    return modules[:top]
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print("Uso: python -m src.startup_timing importtime.log")
+        return 1
+    print(f"{'propio ms':>10} {'acumulado ms':>13}  módulo")
+    for name, self_us, cumulative_us in summarize_importtime(argv[0]):
+        print(f"{self_us / 1000:10.1f} {cumulative_us / 1000:13.1f}  {name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,728 @@
+"""
+Servidor de tienda: varias cajas (POS) vendiendo contra una sola base de datos.
+
+Una PC de la tienda corre el servidor sobre el `profitus.db` compartido:
+
+    python -m src.store_server --host 0.0.0.0 --port 8765 --token secreto
+
+y cada caja arranca la aplicación apuntando a él:
+
+    PROFITUS_SERVER=http://192.168.1.10:8765 PROFITUS_SERVER_TOKEN=secreto python -m src.main
+
+El servidor es HTTP/JSON sobre `ThreadingHTTPServer` (una conexión keep-alive
+por cliente). Las escrituras van a un único hilo escritor con su propia conexión,
+así que se serializan sin bloqueos de SQLite entre cajas. Las lecturas van a un
+pool de conexiones de solo lectura, que en modo WAL corren en paralelo con
+las escrituras. Las dos cosas son `QueryExecutor` como los del hilo de Tk.
+
+`RemoteDatabaseManager` es el cliente: una subclase de DatabaseManager que
+reemplaza las primitivas (`fetch_*`, `execute_*`, `transaction`) y envía
+completos al servidor los métodos que usan la conexión directamente o que
+conviene resolver en un solo viaje (ver FORWARDED_READS / FORWARDED_WRITES).
+El resto de la API se hereda tal cual. Dentro de `transaction()` las escrituras
+se acumulan y viajan juntas en un solo pedido, que el servidor aplica en una
+transacción.
+
+Protocolo: POST /rpc con {"calls": [[método, args, kwargs], ...], "atomic": bool};
+la respuesta es {"results": [{"value": ...} | {"error": {...}}, ...], "config_version": n}.
+"""
+import argparse
+import hmac
+import http.client
+import json
+import ipaddress
+import os
+import re
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache, partial
+from itertools import count
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from sqlite3 import Error
+from types import GeneratorType
+from urllib.parse import urlsplit
+
+from .db_executor import QueryExecutor
+from .db_manager import DB_FILE, READ_POOL_SIZE, REMOTE_BACKUP_MESSAGE, SERVER_TOKEN_ENV, DatabaseManager, decode_rows
+
+DEFAULT_PORT = 8765
+RPC_PATH = "/rpc"
+TOKEN_HEADER = "X-Profitus-Token"
+CLIENT_TIMEOUT = 30  # segundos; un reporte grande puede tardar
+ITER_PAGE_SIZE = 5000  # filas por pedido en iter_query (exportaciones)
+ITER_IDLE_TIMEOUT = 300  # segundos sin pedir filas antes de cerrar un cursor abandonado
+MAX_OPEN_ITERATORS = 8   # cursores de iter_query abiertos a la vez (cada uno con hilo y conexión)
+
+# Métodos de DatabaseManager que el cliente envía completos al servidor
+FORWARDED_READS = (
+    "authenticate_user",
+    "search_products",
+    "get_products_page",
+    "get_product_key_at",
+    "get_catalog_version",
+    "get_product_changes",
+    "get_sales_report_page",
+    "get_sales_report_totals",
+    "get_sales_timeseries",
+    "count_sales",
+    "connection_settings",
+    "check_report_query_plans",
+)
+FORWARDED_WRITES = (
+    "process_sale_transaction",
+    "update_sale_line_quantity",
+    "delete_sale_line",
+    "update_product_prices",
+    "rebuild_daily_sales",
+    "migrate_schema",
+)
+READ_METHODS = frozenset(("fetch_one", "fetch_all", "fetch_columns") + FORWARDED_READS)
+WRITE_METHODS = frozenset(("execute_query", "execute_many") + FORWARDED_WRITES)
+# Cursores de iter_query que el servidor mantiene abiertos entre pedidos (ver ServerIterator)
+ITER_METHODS = frozenset(("iter_open", "iter_next", "iter_close"))
+# Métodos que reciben SQL del cliente
+SQL_METHODS = frozenset(("fetch_one", "fetch_all", "fetch_columns", "execute_query", "execute_many", "iter_open"))
+# Las cajas solo leen y modifican filas: PRAGMA, ATTACH, VACUUM, CREATE/DROP/ALTER, BEGIN/COMMIT, etc.
+# quedan para los métodos del servidor (VACUUM INTO, por ejemplo, copiaría la base a cualquier ruta)
+CLIENT_SQL = re.compile(r"\s*(SELECT|WITH|INSERT|UPDATE|DELETE|REPLACE|VALUES|EXPLAIN)\b", re.IGNORECASE)
+CLIENT_SQL_ACTIONS = frozenset((
+    sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE,
+    sqlite3.SQLITE_INSERT, sqlite3.SQLITE_UPDATE, sqlite3.SQLITE_DELETE,
+    sqlite3.SQLITE_TRANSACTION,  # el BEGIN implícito del módulo sqlite3; CLIENT_SQL no deja enviar uno propio
+))
+# PRAGMA de solo lectura que el propio SQLite ejecuta al abrir la tabla virtual FTS5
+CLIENT_SQL_PRAGMAS = frozenset(("data_version",))
+
+
+# --- Codificación de valores en JSON ---
+
+def encode_value(value):
+    """Convierte un valor de la API de DatabaseManager en algo serializable a JSON.
+
+    Las filas (sqlite3.Row) viajan como columnas + tuplas, las tuplas y los
+    diccionarios con claves no textuales se marcan para reconstruirlos igual.
+    """
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, sqlite3.Row):
+        return {"__row__": [value.keys(), tuple(value)]}
+    if isinstance(value, list):
+        if value and isinstance(value[0], sqlite3.Row):
+            return {"__rows__": [value[0].keys(), [tuple(row) for row in value]]}
+        return [encode_value(item) for item in value]
+    if isinstance(value, tuple):
+        return {"__tuple__": [encode_value(item) for item in value]}
+    if isinstance(value, sqlite3.Cursor):
+        return {"__cursor__": [value.rowcount, value.lastrowid]}
+    if isinstance(value, dict) and all(isinstance(key, str) for key in value):
+        return {key: encode_value(item) for key, item in value.items()}
+    if hasattr(value, "items"):
+        # dict con claves numéricas (p. ej. el carrito: producto_id -> línea) o un Cart
+        return {"__map__": [[encode_value(key), encode_value(item)] for key, item in value.items()]}
+    if isinstance(value, (GeneratorType, map, set, frozenset)):
+        return [encode_value(item) for item in value]
+    raise TypeError(f"Valor no serializable para el servidor de tienda: {type(value).__name__}")
+
+
+def decode_value(value, row_type="row"):
+    """Inverso de encode_value; las filas se entregan en el formato `row_type` (ver ROW_TYPES)."""
+    if isinstance(value, list):
+        return [decode_value(item, row_type) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if "__rows__" in value:
+        columns, rows = value["__rows__"]
+        return decode_result_rows(tuple(columns), rows, row_type)
+    if "__row__" in value:
+        columns, row = value["__row__"]
+        return decode_result_rows(tuple(columns), [row], row_type)[0]
+    if "__tuple__" in value:
+        return tuple(decode_value(item, row_type) for item in value["__tuple__"])
+    if "__cursor__" in value:
+        return RemoteCursor(*value["__cursor__"])
+    if "__map__" in value:
+        return {decode_value(key): decode_value(item, row_type) for key, item in value["__map__"]}
+    return {key: decode_value(item, row_type) for key, item in value.items()}
+
+
+def decode_result_rows(columns, rows, row_type):
+    if row_type == "row":
+        return list(map(partial(tuple.__new__, remote_row_class(columns)), rows))
+    return decode_rows([(column,) for column in columns], list(map(tuple, rows)), row_type)
+
+
+class RemoteRow(tuple):
+    """Fila recibida del servidor; se usa como sqlite3.Row: por posición, por nombre y con keys()."""
+    __slots__ = ()
+    _columns = ()
+    _index = {}
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            try:
+                key = self._index[key.lower()]  # como sqlite3.Row, sin distinguir mayúsculas
+            except KeyError:
+                raise IndexError(f"No item with that key: {key}") from None
+        return tuple.__getitem__(self, key)
+
+    def keys(self):
+        return list(self._columns)
+
+
+@lru_cache(maxsize=256)
+def remote_row_class(columns):
+    index = {}
+    for position, column in enumerate(columns):
+        index.setdefault(column.lower(), position)  # con nombres repetidos gana el primero
+    return type("RemoteRow", (RemoteRow,), {"__slots__": (), "_columns": columns, "_index": index})
+
+
+class RemoteCursor:
+    """Lo que devuelven execute_query / execute_many en el cliente: solo rowcount y lastrowid."""
+    def __init__(self, rowcount=-1, lastrowid=None):
+        self.rowcount = rowcount
+        self.lastrowid = lastrowid
+
+
+def _error_payload(e):
+    kind = "database" if isinstance(e, Error) else "value" if isinstance(e, ValueError) else "server"
+    return {"type": kind, "message": str(e)}
+
+
+def _raise_error(error):
+    if error["type"] == "database":
+        raise Error(error["message"])
+    if error["type"] == "value":
+        raise ValueError(error["message"])
+    raise RuntimeError(f"Error en el servidor de tienda: {error['message']}")
+
+
+# --- Servidor ---
+
+def _run_calls(db, calls, atomic):
+    """Ejecuta un lote de llamadas con el DatabaseManager del hilo (escritor o lector)."""
+    if atomic:
+        try:
+            with db.transaction(immediate=True):
+                values = [_run_call(db, name, args, kwargs) for name, args, kwargs in calls]
+        except Exception as e:
+            return [{"error": _error_payload(e)}] * len(calls)
+        return [{"value": encode_value(value)} for value in values]
+
+    results = []
+    for name, args, kwargs in calls:
+        try:
+            results.append({"value": encode_value(_run_call(db, name, args, kwargs))})
+        except Exception as e:
+            results.append({"error": _error_payload(e)})
+    return results
+
+
+def _run_call(db, name, args, kwargs):
+    if name not in SQL_METHODS:
+        return getattr(db, name)(*args, **kwargs)
+    # El SQL de la caja se prepara con el autorizador estricto. Cambiar de autorizador invalida
+    # las sentencias ya preparadas, así que una consulta en caché no se salta la verificación
+    db.conn.set_authorizer(_authorize_client_sql)
+    try:
+        return getattr(db, name)(*args, **kwargs)
+    finally:
+        db.conn.set_authorizer(_deny_attach)
+
+
+def _touches_config(name, args):
+    """Escrituras que cambian la tabla configuracion: las cajas recargan su caché al enterarse."""
+    return name in ("execute_query", "execute_many") and bool(args) and "configuracion" in str(args[0])
+
+
+def _forbidden_call(name, args):
+    """Mensaje de rechazo si la llamada no está permitida; None si se puede ejecutar."""
+    if name not in READ_METHODS and name not in WRITE_METHODS and name not in ITER_METHODS:
+        return f"Método no permitido: {name}"
+    if name in SQL_METHODS and (not args or not isinstance(args[0], str)):
+        return f"Falta la consulta en {name}."
+    if name in SQL_METHODS and not CLIENT_SQL.match(args[0]):
+        return "El servidor de tienda solo acepta consultas SELECT, INSERT, UPDATE y DELETE."
+    return None
+
+
+def _authorize_client_sql(action, arg1, arg2, *_):
+    """Autorizador para el SQL que envían las cajas: solo leer y modificar filas de tablas de la aplicación."""
+    if action == sqlite3.SQLITE_PRAGMA:
+        return sqlite3.SQLITE_OK if arg1 in CLIENT_SQL_PRAGMAS and arg2 is None else sqlite3.SQLITE_DENY
+    if action not in CLIENT_SQL_ACTIONS:
+        return sqlite3.SQLITE_DENY
+    if action in (sqlite3.SQLITE_INSERT, sqlite3.SQLITE_UPDATE, sqlite3.SQLITE_DELETE) and arg1 and arg1.startswith("sqlite_"):
+        # Salvo sqlite_master: al abrir la tabla virtual FTS5 el propio SQLite pasa por aquí, y una
+        # sentencia del cliente no puede modificarla sin PRAGMA writable_schema (que está denegado)
+        if arg1 != "sqlite_master":
+            return sqlite3.SQLITE_DENY  # sqlite_sequence, sqlite_stat1...
+    return sqlite3.SQLITE_OK
+
+
+def _deny_attach(action, *_):
+    # Los métodos propios del servidor tampoco abren otros archivos
+    if action in (sqlite3.SQLITE_ATTACH, sqlite3.SQLITE_DETACH):
+        return sqlite3.SQLITE_DENY
+    return sqlite3.SQLITE_OK
+
+
+def _server_db(db_path, readonly=False):
+    db = DatabaseManager(db_path, initialize=not readonly, readonly=readonly)
+    if not db.conn:
+        raise Error(f"No se pudo abrir la base de datos {db_path}.")
+    db.conn.set_authorizer(_deny_attach)
+    return db
+
+
+def is_loopback(host):
+    """True si `host` solo es alcanzable desde este equipo (127.0.0.1, ::1, localhost)."""
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        pass
+    try:
+        return all(ipaddress.ip_address(info[4][0]).is_loopback for info in socket.getaddrinfo(host, None))
+    except (OSError, ValueError):
+        return False
+
+
+class ServerIterator:
+    """Cursor de iter_query abierto en el servidor, con hilo y conexión de solo lectura propios.
+
+    La consulta se ejecuta una sola vez y cada `next_page()` sigue leyendo el mismo
+    cursor: mientras esté abierto la lectura ve una foto fija de la base (WAL), así
+    que una exportación no repite ni saltea filas aunque otras cajas sigan vendiendo.
+    """
+    def __init__(self, db_path, query, params):
+        self.last_used = time.monotonic()
+        self.executor = QueryExecutor(partial(self._connect, db_path), name="store-iter")
+        try:
+            self.batches = self.executor.submit(lambda db: db.iter_query(query, params, ITER_PAGE_SIZE)).result()
+        except Exception:
+            self.executor.shutdown()
+            raise
+
+    @staticmethod
+    def _connect(db_path):
+        db = _server_db(db_path, readonly=True)
+        db.conn.set_authorizer(_authorize_client_sql)  # la conexión solo corre la consulta de la caja
+        return db
+
+    def next_page(self):
+        """Siguiente lote de hasta ITER_PAGE_SIZE filas; None cuando se terminó el resultado."""
+        self.last_used = time.monotonic()
+        return self.executor.submit(lambda db: next(self.batches, None)).result()
+
+    def close(self):
+        self.executor.submit(lambda db: self.batches.close())  # el cursor se cierra en su propio hilo
+        self.executor.shutdown()
+
+
+class StoreServer(ThreadingHTTPServer):
+    """Servidor HTTP/JSON sobre un DatabaseManager con un escritor y un pool de lectores."""
+    daemon_threads = True
+
+    def __init__(self, address, db_path=DB_FILE, readers=READ_POOL_SIZE, token=None, verbose=False):
+        if not token and not is_loopback(address[0]):
+            raise ValueError(f"Se necesita un token para escuchar en {address[0]}: cualquier equipo de la red podría usar la base.")
+        self.token = token
+        self.verbose = verbose
+        self.db_path = db_path
+        self.config_version = 0
+        self.iterators = {}  # id -> ServerIterator
+        self._iterator_ids = count(1)
+        self._iterators_lock = threading.Lock()
+        # El escritor crea y migra la base antes de que se abran los lectores de solo lectura
+        self.writer = QueryExecutor(lambda: _server_db(db_path), name="store-writer")
+        try:
+            self.writer.submit(lambda db: None).result()
+        except Exception:
+            self.writer.shutdown()
+            raise
+        self.readers = QueryExecutor(lambda: _server_db(db_path, readonly=True), name="store-reader", workers=readers)
+        super().__init__(address, StoreRequestHandler)
+
+    def dispatch(self, request):
+        calls = [(name, args, kwargs) for name, args, kwargs in request["calls"]]
+        for name, args, _ in calls:
+            message = _forbidden_call(name, args)
+            if message:
+                return {"error": {"type": "server", "message": message}}
+        if calls[0][0] in ITER_METHODS:
+            name, args, _ = calls[0]
+            try:
+                result = {"value": encode_value(self._iterate(name, args))}
+            except Exception as e:
+                result = {"error": _error_payload(e)}
+            return {"results": [result], "config_version": self.config_version}
+
+        atomic = bool(request.get("atomic"))
+        writes = atomic or any(name in WRITE_METHODS for name, _, _ in calls)
+        if writes:
+            results = self.writer.submit(self._write_batch, calls, atomic).result()
+        else:
+            results = self.readers.submit(_run_calls, calls, atomic).result()
+        return {"results": results, "config_version": self.config_version}
+
+    def _write_batch(self, db, calls, atomic):
+        results = _run_calls(db, calls, atomic)
+        if any(_touches_config(name, args) for name, args, _ in calls):
+            self.config_version += 1  # solo lo modifica el hilo escritor
+        return results
+
+    def _iterate(self, name, args):
+        """iter_open(query, params) -> id; iter_next(id) -> lote o None al terminar; iter_close(id)."""
+        if name == "iter_open":
+            self._close_idle_iterators()
+            with self._iterators_lock:
+                if len(self.iterators) >= MAX_OPEN_ITERATORS:
+                    raise ValueError("Hay demasiadas exportaciones en curso en el servidor de tienda; intente más tarde.")
+                iterator_id = next(self._iterator_ids)
+                self.iterators[iterator_id] = None  # reserva el lugar mientras se abre
+            try:
+                iterator = ServerIterator(self.db_path, *args)
+            except Exception:
+                with self._iterators_lock:
+                    del self.iterators[iterator_id]
+                raise
+            with self._iterators_lock:
+                self.iterators[iterator_id] = iterator
+            return iterator_id
+
+        with self._iterators_lock:
+            iterator = self.iterators.get(args[0])
+        if iterator is None:
+            raise ValueError("La exportación ya no está abierta en el servidor de tienda.")
+        rows = None if name == "iter_close" else iterator.next_page()
+        if rows is None:
+            with self._iterators_lock:
+                self.iterators.pop(args[0], None)
+            iterator.close()
+        return rows
+
+    def _close_idle_iterators(self):
+        limit = time.monotonic() - ITER_IDLE_TIMEOUT
+        with self._iterators_lock:
+            idle = [key for key, iterator in self.iterators.items() if iterator and iterator.last_used < limit]
+            iterators = [self.iterators.pop(key) for key in idle]
+        for iterator in iterators:
+            iterator.close()
+
+    def server_close(self):
+        super().server_close()
+        with self._iterators_lock:
+            iterators, self.iterators = [it for it in self.iterators.values() if it], {}
+        for iterator in iterators:
+            iterator.close()
+        self.readers.shutdown()
+        self.writer.shutdown()
+
+
+class StoreRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"     # keep-alive: una conexión por caja
+    disable_nagle_algorithm = True    # respuestas chicas sin esperar el ACK retardado
+
+    def do_POST(self):
+        if self.path != RPC_PATH:
+            self._reply(404, {"error": {"type": "server", "message": "Ruta desconocida."}})
+            return
+        if self.server.token and not hmac.compare_digest(self.headers.get(TOKEN_HEADER, "").encode("utf-8"),
+                                                         self.server.token.encode("utf-8")):
+            self._reply(403, {"error": {"type": "server", "message": "Token inválido."}})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            request["calls"] = [(name, decode_value(args), decode_value(kwargs))
+                                for name, args, kwargs in request["calls"]]
+        except (ValueError, KeyError, TypeError) as e:
+            self._reply(400, {"error": {"type": "server", "message": f"Pedido inválido: {e}"}})
+            return
+        self._reply(200, self.server.dispatch(request))
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+# --- Cliente ---
+
+class RemoteDatabaseManager(DatabaseManager):
+    """DatabaseManager que trabaja contra un StoreServer en lugar de un archivo local.
+
+    Mantiene una conexión HTTP keep-alive por instancia (los hilos de `submit`
+    crean la suya, como con SQLite). Dentro de `transaction()` las escrituras no
+    se envían en el momento: se acumulan y viajan juntas al cerrar el bloque
+    externo, que el servidor aplica en una transacción; un error de SQL se
+    informa recién ahí. Las lecturas dentro del bloque no ven esas escrituras.
+    `call_many()` agrupa varias llamadas en un solo viaje.
+    """
+    def __init__(self, url, token=None, timeout=CLIENT_TIMEOUT):
+        self.db_path = url
+        self.url = url
+        self.token = token
+        self.timeout = timeout
+        self.conn = None
+        self.readonly = False
+        self._tx_depth = 0
+        self._pending = None        # escrituras acumuladas por transaction()
+        self._config_version = None
+        self.pragmas = {}
+        self.fts_enabled = False
+        self.executor = None
+        self.read_executor = None
+        self.ui_owner = None
+        self._config = None
+        self._config_subscribers = {}
+        self.connect()
+        self.fts_enabled = self._has_fts_index()
+
+    def connect(self):
+        parts = urlsplit(self.url if "//" in self.url else f"http://{self.url}")
+        self.conn = http.client.HTTPConnection(parts.hostname, parts.port or DEFAULT_PORT, timeout=self.timeout)
+        print(f"Conectado al servidor de tienda: {self.url}")
+
+    def close(self):
+        for executor in (self.read_executor, self.executor):
+            if executor is not None:
+                executor.shutdown()
+        self.executor = self.read_executor = None
+        if self.conn:
+            self.conn.close()
+            self.conn = None
+            print("Conexión al servidor de tienda cerrada.")
+
+    remote = True
+
+    def perform_backup(self, destination_path):
+        return False, REMOTE_BACKUP_MESSAGE
+
+    def restore_backup(self, source_path):
+        return False, REMOTE_BACKUP_MESSAGE
+
+    def _create_worker_db(self, readonly=False):
+        # El servidor decide qué conexión usa; aquí cada hilo solo necesita su propio socket
+        worker_db = RemoteDatabaseManager(self.url, token=self.token, timeout=self.timeout)
+        worker_db.ui_owner = self
+        return worker_db
+
+    def submit(self, fn, *args, **kwargs):
+        # Las páginas pasan `DatabaseManager.metodo` sin enlazar: se cambia por el de esta clase
+        # para no saltearse el reenvío al servidor
+        name = getattr(fn, "__name__", None)
+        if name and getattr(DatabaseManager, name, None) is fn:
+            fn = getattr(RemoteDatabaseManager, name)
+        return super().submit(fn, *args, **kwargs)
+
+    # --- Transporte ---
+
+    def _post(self, payload, retry):
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers[TOKEN_HEADER] = self.token
+        for attempt in (1, 2):
+            try:
+                self.conn.request("POST", RPC_PATH, body, headers)
+                response = self.conn.getresponse()
+                data = response.read()
+                break
+            except (http.client.HTTPException, OSError) as e:
+                self.conn.close()  # la siguiente request abre un socket nuevo
+                # Solo las lecturas se reintentan: una venta no debe aplicarse dos veces
+                if attempt == 2 or not retry:
+                    raise sqlite3.OperationalError(f"Servidor de tienda no disponible ({self.url}): {e}") from e
+        reply = json.loads(data)
+        if "error" in reply:
+            _raise_error(reply["error"])
+        self._check_config_version(reply.get("config_version"))
+        return reply["results"]
+
+    def _check_config_version(self, version):
+        """Si otra caja cambió la configuración (p. ej. la tasa), recarga la caché y avisa a los suscriptores."""
+        if version == self._config_version:
+            return
+        stale = self._config_version is not None
+        self._config_version = version
+        if stale and self._config is not None and self.ui_owner is None and not self.in_transaction:
+            self.reload_config()
+
+    def call_many(self, calls, atomic=False):
+        """Envía varias llamadas `(método, args, kwargs)` en un solo viaje y devuelve sus resultados.
+
+        Con `atomic=True` el servidor las aplica en una sola transacción (todas o ninguna).
+        Si alguna falla se lanza su error.
+        """
+        calls = list(calls)
+        row_types = [kwargs.get("row_type", "row") for _, _, kwargs in calls]
+        payload = {
+            "calls": [[name, encode_value(list(args)),
+                       encode_value(dict(kwargs, row_type="row") if "row_type" in kwargs else kwargs)]
+                      for name, args, kwargs in calls],
+            "atomic": atomic,
+        }
+        retry = not atomic and all(name in READ_METHODS for name, _, _ in calls)
+        values = []
+        for result, row_type in zip(self._post(payload, retry), row_types):
+            if "error" in result:
+                _raise_error(result["error"])
+            values.append(decode_value(result["value"], row_type))
+        return values
+
+    def _call(self, name, *args, **kwargs):
+        return self.call_many([(name, args, kwargs)])[0]
+
+    # --- Primitivas ---
+
+    @contextmanager
+    def transaction(self, immediate=False):
+        outer = self._tx_depth == 0
+        if outer:
+            self._pending = []
+        mark = len(self._pending)
+        self._tx_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._tx_depth -= 1
+            if outer:
+                self._pending = None
+            else:
+                del self._pending[mark:]  # como ROLLBACK TO del bloque anidado
+            raise
+        self._tx_depth -= 1
+        if not outer:
+            return
+        calls, self._pending = self._pending, None
+        if not calls:
+            return
+        try:
+            self.call_many(calls, atomic=True)
+        except Error:
+            if self._config is not None:
+                self.reload_config()  # la caché pudo tomar valores que no llegaron a guardarse
+            raise
+
+    def execute_query(self, query, params=()):
+        if self.in_transaction:
+            self._pending.append(("execute_query", (query, params), {}))
+            return RemoteCursor()
+        try:
+            return self._call("execute_query", query, params)
+        except Error as e:
+            print(f"Error al ejecutar consulta: {e}")
+            return None
+
+    def execute_many(self, query, rows):
+        rows = [row if isinstance(row, dict) else list(row) for row in rows]
+        if self.in_transaction:
+            self._pending.append(("execute_many", (query, rows), {}))
+            return RemoteCursor()
+        try:
+            return self._call("execute_many", query, rows)
+        except Error as e:
+            print(f"Error al ejecutar consulta por lotes: {e}")
+            return None
+
+    def fetch_one(self, query, params=(), row_type="row"):
+        try:
+            return self._call("fetch_one", query, params, row_type=row_type)
+        except Error as e:
+            print(f"Error al obtener una fila: {e}")
+            return None
+
+    def fetch_all(self, query, params=(), row_type="row"):
+        try:
+            return self._call("fetch_all", query, params, row_type=row_type)
+        except Error as e:
+            print(f"Error al obtener todas las filas: {e}")
+            return []
+
+    def fetch_columns(self, query, params=()):
+        try:
+            return self._call("fetch_columns", query, params)
+        except Error as e:
+            print(f"Error al obtener columnas: {e}")
+            return {}
+
+    def iter_query(self, query, params=(), batch_size=1000, row_type="row"):
+        """Como DatabaseManager.iter_query: el servidor deja el cursor abierto y lo entrega en páginas.
+
+        Cada página de ITER_PAGE_SIZE filas es un pedido aparte, así que una
+        exportación grande no queda atada a un solo pedido de CLIENT_TIMEOUT segundos
+        ni se carga completa en memoria; la consulta corre una sola vez (ver ServerIterator).
+        """
+        iterator = self._call("iter_open", query, params)
+        pending = []
+        try:
+            while True:
+                rows = self._call("iter_next", iterator, row_type=row_type)
+                if rows is None:
+                    iterator = None  # el servidor ya lo cerró
+                    break
+                pending.extend(rows)
+                while len(pending) >= batch_size:
+                    yield pending[:batch_size]
+                    del pending[:batch_size]
+        finally:
+            if iterator is not None:  # exportación cancelada o con error
+                try:
+                    self._call("iter_close", iterator)
+                except (Error, ValueError):
+                    pass
+        if pending:
+            yield pending
+
+
+def _forward(name):
+    def method(self, *args, **kwargs):
+        return self._call(name, *args, **kwargs)
+    method.__name__ = name
+    method.__doc__ = getattr(DatabaseManager, name).__doc__
+    return method
+
+
+for _name in FORWARDED_READS + FORWARDED_WRITES:
+    setattr(RemoteDatabaseManager, _name, _forward(_name))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor de tienda: comparte la base de datos entre varias cajas.")
+    parser.add_argument("--host", default="127.0.0.1", help="interfaz (0.0.0.0 para aceptar cajas de la red local)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--db", default=DB_FILE, help=f"base de datos (por defecto {DB_FILE})")
+    parser.add_argument("--lectores", type=int, default=READ_POOL_SIZE, help="conexiones de solo lectura")
+    parser.add_argument("--token", default=os.environ.get(SERVER_TOKEN_ENV), help="clave que deben enviar las cajas")
+    parser.add_argument("--verbose", action="store_true", help="registrar cada pedido")
+    args = parser.parse_args(argv)
+    if not args.token and not is_loopback(args.host):
+        parser.error(f"--token (o {SERVER_TOKEN_ENV}) es obligatorio para escuchar en {args.host}")
+
+    try:
+        server = StoreServer((args.host, args.port), args.db, readers=args.lectores, token=args.token, verbose=args.verbose)
+    except Error as e:
+        print(f"No se pudo iniciar el servidor de tienda: {e}")
+        return 1
+    print(f"Servidor de tienda escuchando en http://{args.host}:{args.port} (base: {args.db})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
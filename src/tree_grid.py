@@ -0,0 +1,259 @@
+class TreeGrid:
+    """Enlaza un ttk.Treeview con un modelo indexado por clave (iid -> valores de la fila).
+
+    En lugar de borrar y volver a insertar todo, aplica solo las diferencias
+    (insertar / actualizar con `item(iid, values=...)` / eliminar). Como los items
+    que no cambian nunca se recrean, Tk conserva la selección, el foco y el scroll.
+    """
+    def __init__(self, tree):
+        self.tree = tree
+        self.rows = {}   # iid -> (values, tags)
+        self.order = []  # iids en el orden en que se muestran
+
+    def __contains__(self, iid):
+        return str(iid) in self.rows
+
+    def __len__(self):
+        return len(self.order)
+
+    def values(self, iid):
+        row = self.rows.get(str(iid))
+        return row[0] if row else None
+
+    def set_rows(self, rows):
+        """Reemplaza el contenido por `rows` (iterable de `(iid, values, tags)`) aplicando solo los cambios."""
+        new_rows = {}
+        new_order = []
+        for iid, values, tags in rows:
+            iid = str(iid)
+            new_rows[iid] = (tuple(values), tuple(tags))
+            new_order.append(iid)
+
+        stale = [iid for iid in self.order if iid not in new_rows]
+        if stale:
+            self.tree.delete(*stale)
+
+        # Reordenar solo si los items que sobreviven cambiaron de orden relativo
+        survivors_old = [iid for iid in self.order if iid in new_rows]
+        survivors_new = [iid for iid in new_order if iid in self.rows]
+        if survivors_old != survivors_new:
+            for index, iid in enumerate(survivors_new):
+                self.tree.move(iid, "", index)
+
+        for index, iid in enumerate(new_order):
+            values, tags = new_rows[iid]
+            old = self.rows.get(iid)
+            if old is None:
+                self.tree.insert("", index, iid=iid, values=values, tags=tags)
+            elif old != (values, tags):
+                self.tree.item(iid, values=values, tags=tags)
+
+        self.rows = new_rows
+        self.order = new_order
+
+    def upsert(self, iid, values, tags=(), index="end"):
+        """Actualiza la fila si existe; si no, la inserta en `index`."""
+        iid = str(iid)
+        row = (tuple(values), tuple(tags))
+        old = self.rows.get(iid)
+        if old is not None:
+            if old != row:
+                self.tree.item(iid, values=row[0], tags=row[1])
+                self.rows[iid] = row
+            return
+
+        self.tree.insert("", index, iid=iid, values=row[0], tags=row[1])
+        if index == "end":
+            self.order.append(iid)
+        else:
+            self.order.insert(index, iid)
+        self.rows[iid] = row
+
+    def remove(self, iid):
+        iid = str(iid)
+        if iid in self.rows:
+            self.tree.delete(iid)
+            del self.rows[iid]
+            self.order.remove(iid)
+
+    def clear(self):
+        self.set_rows(())
+
+
+class VirtualTreeGrid(TreeGrid):
+    """TreeGrid con modo virtual: solo materializa en Tk las filas visibles.
+
+    Las filas se piden a la base de datos por páginas con paginación por clave
+    (`fetch_page(key, limit, direction)`, ver `DatabaseManager.get_products_page`)
+    y se guardan en un buffer con `overscan` filas extra a cada lado, de modo que
+    el tiempo de apertura y la memoria no dependen del tamaño del catálogo.
+    `show_rows()` pasa a modo estático (p. ej. resultados de búsqueda) y
+    `browse()` vuelve al listado virtual. Si `count` es None, el total se
+    informa con `set_total()`.
+    """
+    def __init__(self, tree, scrollbar, fetch_page, key_at, count, format_row, row_key,
+                 overscan=20, row_height=25):
+        super().__init__(tree)
+        self.scrollbar = scrollbar
+        self.fetch_page = fetch_page
+        self.key_at = key_at
+        self.count = count
+        self.format_row = format_row
+        self.row_key = row_key
+        self.overscan = overscan
+        self.row_height = row_height
+
+        self.virtual = False
+        self.total = 0
+        self.top = 0
+        self.visible = 20
+        self.buffer = []
+        self.buffer_offset = 0
+
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            tree.bind(sequence, self._on_mouse_wheel)
+        tree.bind("<Next>", lambda e: self._scroll_key(self.visible))
+        tree.bind("<Prior>", lambda e: self._scroll_key(-self.visible))
+        tree.bind("<Down>", lambda e: self._on_arrow_key(1))
+        tree.bind("<Up>", lambda e: self._on_arrow_key(-1))
+        tree.bind("<Configure>", self._on_configure, add="+")
+
+    # --- Cambio de modo ---
+
+    def browse(self):
+        """Muestra el listado virtual; si ya estaba activo, solo refresca la ventana actual."""
+        if self.virtual:
+            self.refresh()
+            return
+        self.virtual = True
+        self.tree.configure(yscrollcommand="")
+        self.scrollbar.configure(command=self.yview)
+        if self.count is not None:
+            self.total = self.count()
+        self.buffer = []
+        self.scroll_to(0)
+
+    def show_rows(self, rows):
+        """Modo estático: muestra `rows` (ya formateadas) y devuelve el scroll al Treeview."""
+        if self.virtual:
+            self.virtual = False
+            self.buffer = []
+            self.scrollbar.configure(command=self.tree.yview)
+            self.tree.configure(yscrollcommand=self.scrollbar.set)
+        self.set_rows(rows)
+
+    def refresh(self):
+        """Vuelve a leer la ventana actual (p. ej. tras un cambio en el catálogo) sin mover el scroll."""
+        if not self.virtual:
+            return
+        if self.count is not None:
+            self.total = self.count()
+        if self.buffer:
+            first_key = self.row_key(self.buffer[0])
+            self.buffer = self.fetch_page(first_key, len(self.buffer), "from")
+        self.scroll_to(self.top, force_render=True)
+
+    def set_total(self, total):
+        """Actualiza el total de filas cuando se cuenta por fuera (p. ej. en segundo plano, con `count=None`)."""
+        self.total = total
+        if self.virtual:
+            self.scroll_to(self.top, force_render=True)
+
+    # --- Scroll ---
+
+    def yview(self, *args):
+        """Comando del scrollbar: admite 'moveto <fracción>' y 'scroll <n> units|pages'."""
+        if not args:
+            return
+        if args[0] == "moveto":
+            self.scroll_to(int(float(args[1]) * self.total))
+        elif args[0] == "scroll":
+            amount = int(float(args[1]))
+            if len(args) > 2 and args[2] == "pages":
+                amount *= self.visible
+            self.scroll_to(self.top + amount)
+
+    def scroll_to(self, top, force_render=False):
+        top = max(0, min(top, self.total - self.visible))
+        if top == self.top and not force_render and self.buffer:
+            return
+        self.top = top
+        self._ensure_buffer()
+        self._render()
+
+    def _ensure_buffer(self):
+        wanted_start = max(0, self.top - self.overscan)
+        wanted_end = self.top + self.visible + self.overscan
+        buffer_end = self.buffer_offset + len(self.buffer)
+
+        if self.buffer and self.buffer_offset <= self.top and self.top + self.visible <= buffer_end:
+            return
+
+        if self.buffer and self.buffer_offset <= self.top <= buffer_end:
+            # Avance secuencial: se piden solo las filas siguientes al último de la ventana
+            rows = self.fetch_page(self.row_key(self.buffer[-1]), wanted_end - buffer_end, "next")
+            self.buffer.extend(rows)
+        elif self.buffer and self.top < self.buffer_offset < self.top + self.visible + self.overscan:
+            # Retroceso secuencial
+            rows = self.fetch_page(self.row_key(self.buffer[0]), self.buffer_offset - wanted_start, "prev")
+            self.buffer[0:0] = rows
+            self.buffer_offset -= len(rows)
+        else:
+            # Salto (scrollbar arrastrado): la clave de inicio se busca recorriendo solo el índice
+            key = self.key_at(wanted_start)
+            self.buffer = self.fetch_page(key, wanted_end - wanted_start, "from") if key else []
+            self.buffer_offset = wanted_start
+
+        # Acotar el buffer a la ventana más el overscan
+        trim_front = max(0, wanted_start - self.buffer_offset)
+        if trim_front:
+            del self.buffer[:trim_front]
+            self.buffer_offset += trim_front
+        del self.buffer[wanted_end - self.buffer_offset:]
+
+    def _render(self):
+        start = self.top - self.buffer_offset
+        window = self.buffer[start:start + self.visible]
+        self.set_rows(self.format_row(row) for row in window)
+        if self.total:
+            self.scrollbar.set(self.top / self.total, min(1.0, (self.top + self.visible) / self.total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    # --- Eventos ---
+
+    def _on_mouse_wheel(self, event):
+        if not self.virtual:
+            return None
+        if getattr(event, "num", None) == 4 or getattr(event, "delta", 0) > 0:
+            self.scroll_to(self.top - 3)
+        else:
+            self.scroll_to(self.top + 3)
+        return "break"
+
+    def _scroll_key(self, amount):
+        if not self.virtual:
+            return None
+        self.scroll_to(self.top + amount)
+        return "break"
+
+    def _on_arrow_key(self, step):
+        """En los bordes de la ventana, las flechas desplazan el listado en lugar de perder el foco."""
+        if not self.virtual or not self.order:
+            return None
+        focus = self.tree.focus()
+        edge = self.order[-1] if step > 0 else self.order[0]
+        if focus != edge:
+            return None
+        self.scroll_to(self.top + step)
+        new_focus = self.order[-1] if step > 0 else self.order[0]
+        self.tree.focus(new_focus)
+        self.tree.selection_set(new_focus)
+        return "break"
+
+    def _on_configure(self, event):
+        visible = max(1, (event.height - self.row_height) // self.row_height)
+        if visible != self.visible:
+            self.visible = visible
+            if self.virtual:
+                self.scroll_to(self.top, force_render=True)
@@ -1,3 +1,7 @@
+import re
+import unicodedata
+
+
 def is_valid_float(value):
     """
     Verifica si una cadena de texto puede ser convertida a un número decimal (float).
@@ -18,3 +22,35 @@ def is_valid_float(value):
         return True
     except ValueError:
         return False
+
+
+# Caracteres que el índice de búsqueda trata como parte de una palabra (códigos tipo "P-001")
+SEARCH_TOKEN_CHARS = "-_./"
+# \w equivale a str.isalnum() más "_"
+_SEARCH_TOKEN_RE = re.compile(r"[\w" + re.escape(SEARCH_TOKEN_CHARS) + r"]+")
+
+
+def normalize_search_text(text):
+    """
+    Normaliza un texto para búsquedas: minúsculas y sin acentos ("Inalámbrico" -> "inalambrico").
+    Equivale al tokenizador `unicode61 remove_diacritics 2` del índice FTS5 de productos.
+    """
+    text = str(text or "")
+    if text.isascii():
+        return text.lower()  # caso más común: nada que descomponer
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+
+
+def search_tokens(text):
+    """Divide un texto normalizado en palabras, igual que el índice de búsqueda de productos."""
+    return _SEARCH_TOKEN_RE.findall(normalize_search_text(text))
+
+
+def matches_search_terms(term, *fields):
+    """
+    Indica si cada palabra de `term` es prefijo de alguna palabra de `fields`.
+    Reproduce en memoria la semántica de `DatabaseManager.search_products`.
+    """
+    field_tokens = [token for field in fields for token in search_tokens(field)]
+    return all(any(token.startswith(query) for token in field_tokens) for query in search_tokens(term))
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# Las pruebas importan el paquete como `src.*`, igual que main.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "slow: pruebas que generan volúmenes grandes de datos")
@@ -0,0 +1,45 @@
+"""
+Los planes de las consultas de reportes no deben recorrer tablas completas.
+
+Con una base vacía SQLite elige casi cualquier plan, así que la verificación se
+hace sobre un historial de un millón de ventas con estadísticas (ANALYZE), que
+es cuando un SCAN de ventas se nota en la pantalla de reportes.
+"""
+import pytest
+
+from src.db_manager import DatabaseManager
+
+NUM_SALES = 1_000_000
+NUM_SELLERS = 20
+
+
+@pytest.fixture(scope="module")
+def sales_history_db(tmp_path_factory):
+    db = DatabaseManager(str(tmp_path_factory.mktemp("reportes") / "historial.db"))
+    with db.transaction():
+        for n in range(NUM_SELLERS):
+            db.execute_query("INSERT INTO usuarios (username, password, nombre_completo, rol) VALUES (?, ?, ?, ?)",
+                             (f"vendedor{n}", "x", f"Vendedor {n}", "Vendedor"))
+        # Ventas repartidas cada ~1,5 minutos desde 2022, con una línea de detalle cada una
+        db.execute_query("""
+            WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?)
+            INSERT INTO ventas (fecha, total_bs, total_usd, tasa_cambio, user_id, payment_method)
+            SELECT datetime('2022-01-01', '+' || (i * 90) || ' seconds'), (i % 500) * 36.5, i % 500, 36.5,
+                   1 + i % (? + 1), CASE i % 3 WHEN 0 THEN 'Efectivo' WHEN 1 THEN 'Pago Móvil' ELSE 'Tarjeta' END
+            FROM n
+        """, (NUM_SALES, NUM_SELLERS))
+        db.execute_query("""
+            INSERT INTO detalles_venta (venta_id, producto_id, nombre_producto, cantidad, precio_unitario_usd,
+                                        precio_unitario_bs, subtotal_usd, subtotal_bs)
+            SELECT id, 1 + id % 5, 'Producto', 1, total_usd, total_bs, total_usd, total_bs FROM ventas
+        """)
+    db.rebuild_daily_sales()
+    db.execute_query("ANALYZE")
+    yield db
+    db.close()
+
+
+@pytest.mark.slow
+def test_report_queries_use_indexes(sales_history_db):
+    assert sales_history_db.count_sales() == NUM_SALES
+    assert sales_history_db.check_report_query_plans() == {}